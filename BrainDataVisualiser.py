@@ -8,28 +8,57 @@
 # numpy
 # pygame
 # radon - For Quality Assurance Metrics Only
+# h5py - For SNIRF Files Only
 # configparser
 
+import time
+START_TIME = time.perf_counter()# For measuring time-to-first-paint
 import tkinter as tk
-from PIL import ImageTk, Image
-import cv2
 import numpy as np
 import os
-import time
-import pygame.mixer as mixer
+import importlib
 from enum import Enum
 import xml.etree.ElementTree as ET
 import datetime
 import threading
+import concurrent.futures
+import multiprocessing
+import queue
+import socket
+import bisect
+import csv
+import collections
+import hashlib
+import codecs
+import json
+import shutil
+import tempfile
+import glob
+import warnings
+from tkinter import simpledialog
 import mmap
 from pathvalidate import sanitize_filepath
-from subprocess import PIPE, run
+from subprocess import PIPE, DEVNULL, Popen, run
 import re
 import configparser
 import sys
-# QA Code
-from radon.raw import analyze
-from radon.complexity import cc_rank, cc_visit
+
+class LazyModule():
+    """Module Proxy that Imports on First Attribute Access, Keeps Startup Fast"""
+    def __init__(self,name):
+        self.name = name
+        self.module = None
+    def __getattr__(self,attr):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module,attr)
+
+# Heavy and optional modules, loaded on first use
+cv2 = LazyModule("cv2")
+mixer = LazyModule("pygame.mixer")
+Image = LazyModule("PIL.Image")
+ImageTk = LazyModule("PIL.ImageTk")
+h5py = LazyModule("h5py")
 
 # Colours
 RED = "#ff0000"
@@ -42,6 +71,9 @@ CB_GREEN = "#cc79a7"# Uses Pink Instead, More Perceptible
 # Regex Expressions
 MATCH_OXY = ".*O2Hb.*"
 MATCH_DEOXY = ".*HHb.*"
+MATCH_TIME = r"^\s*(t|time|timestamps?)\s*(\(s\))?\s*$"# Optional per-row timestamp column (s)
+# Time allowed from launch until the window is first painted (s)
+STARTUP_BUDGET = 1.0
 
 # Help Popup Text
 HELP = \
@@ -50,9 +82,19 @@ p\t\tPlay
 s\t\tPause
 x\t\tStop
 LeftMB\t\tSeek
+Ctrl+LeftMB\tToggle Spectrogram
+Shift+LeftMB\tSelect Range Statistics (Drag)
 RightMB\t\tPeek at Time
+Shift+RightMB\tAdd Marker (Drag for Interval)
+Ctrl+RightMB\tRemove Marker
+n\t\tNext Marker
+b\t\tPrevious Marker
+,\t\tPrevious Frame
+.\t\tNext Frame
 LeftArrowKey\tSkip Forwards 10s
-RightArrowKey\tSkip Backwards 10s\n
+RightArrowKey\tSkip Backwards 10s
+]\t\tFaster Playback (up to 16x)
+[\t\tSlower Playback\n
 Refer to the User Manual for further help
 """
 
@@ -66,6 +108,7 @@ ICON_PATH = os.path.join(base_path,"icon.ico")
 
 class Application():
     """Class for Application Window and Project Settings"""
+    CONTROL_RETRY_MS = 10# Delay before retrying a control that arrived while another was running
     
     def __init__(self):
 
@@ -77,22 +120,48 @@ class Application():
 
         self.dataOffset = 0# Offset at which video is played relative to data
         self.colBlindMode = 1# Colour blind mode
-        self.controlLock = threading.Lock()# Ensures thread-safe locking/unlocking access of user controls
+        self.useProxies = True# Play from low-resolution proxies once they are built
+        self.frameCache = FrameCache(256*2**20)# Recently decoded frames, budget set from config
+        self.quality = None# Per-channel signal quality of the loaded data, from QualityScan
+        self.qualityEnds = []# Sorted region ends of each channel's quality, for finding the visible regions
+        self.epochWindow = None# Open EpochWindow, refreshed when markers or channels change
+        self.connectivityWindow = None# Open ConnectivityWindow, follows the scrubber by itself
+        self.rangeStats = RangeStatsCache()# Prefix sums of shown channels, for statistics of a selection
+        self.selection = None# [start, end] (data time, s) of the selected range
+        self.chunkedStorage = False# Keep fNIRS data on disk in blocks, for recordings larger than RAM
+        self.blockCacheBytes = 64*2**20# Memory for blocks read from disk
+        self.proxyCache = ProxyCache()
+        self.controlLock = threading.Lock()# Held while a user control runs, controls arriving meanwhile are retried
         self.dataPath = ""# Path to fNIRS data
         self.videoPath = ""# Path to video data
         self.data = None # fNIRS data
+        self.channelMask = []# Channels shown in dataplayers, saved with the project
+        self.markerPath = "project_markers.csv"# Markers and annotations, saved with the project
+        self.markers = MarkerIndex()# Timestamped markers (data time, s)
+        self.annotations = IntervalIndex()# Interval annotations (data time, s)
 
         # Regex Objects
         self.match_oxy = re.compile(MATCH_OXY)
         self.match_deoxy = re.compile(MATCH_DEOXY)
 
+        # Background work, results are applied to widgets in the Tk thread
+        self.tasks = TaskManager(self.root)
+        self.spectrograms = SpectrogramCache(self.tasks)# Per-channel spectrograms of the loaded data
+
+        # Coalesces dataplayer redraws, must exist before any dataplayer
+        self.redrawScheduler = RedrawScheduler(self)
+
         self.videoPlayer = VideoPlayer(self.root,self,row=0,column=0)
         self.channelSelector = ChannelSelector(self.root,self,row=0,column=1)
-        self.dataPlayers = [DataPlayer(self.root,self,row=1,column=0,sensor_ids=[0,1])]
+        self.dataPlayers = [DataPlayer(self.root,self,row=2,column=0,sensor_ids=[0,1])]
+        self.audioLane = None# Waveform of the video's audio, kept in dataPlayers across channel changes
+        self.filmstrip = None# Thumbnails of the main video above the dataplayers, kept likewise
 
         # fNIRS Data
         self.tree = None
         self.data = None
+        self.values = None# fNIRS data as a (measurements x sensors) float array
+        self.timebase = None# Maps time to rows of values
         self.samplerate = None
         self.sensors = []
         self.sensorMask = []
@@ -107,8 +176,13 @@ class Application():
         self.menubar = None
         self.createMenubar()
 
+        # Restore last project once the window has been painted
+        self.live = None# LiveSession when following a recording in progress
+        self.populateQueue = []# (row, sensor_ids) of dataplayers still to be created
+        self.root.after(1,self.restoreProject)
+
     def loadConfig(self):
-        """Load Project Settings from BDV_settings.ini"""
+        """Load Project Settings from BDV_settings.ini, media is restored later by restoreProject"""
         self.config.read(self.CONFIG_FILE)
         try:
             assert "Settings" in self.config
@@ -120,10 +194,110 @@ class Application():
         self.videoPath = settings.get("videopath",fallback="")
         self.dataOffset = settings.getfloat("dataoffset",fallback=0)
         self.colBlindMode = settings.getboolean("colblindmode",False)
+        self.useProxies = settings.getboolean("useproxies",True)
+        self.frameCache.budget = settings.getfloat("framecachemb",fallback=256)*2**20
+        self.chunkedStorage = settings.getboolean("chunkedstorage",False)
+        self.blockCacheBytes = settings.getfloat("blockcachemb",fallback=64)*2**20
+        self.channelMask = [int(c) for c in settings.get("channelmask",fallback="") if c in "01"]
+        # Additional video panes, one section each
+        self.paneVideos = []
+        while "Video{0}".format(len(self.paneVideos)+2) in self.config:
+            section = self.config["Video{0}".format(len(self.paneVideos)+2)]
+            self.paneVideos.append((section.get("path",fallback=""),section.getfloat("offset",fallback=0)))
+        self.markerPath = settings.get("markerpath",fallback=self.markerPath)
+
+    def restoreProject(self):
+        """Report time-to-first-paint, then load the last project in the background"""
+        self.root.update_idletasks()
+        elapsed = time.perf_counter()-START_TIME
+        print("First Paint[{0:.2f}s]".format(elapsed))
+        if elapsed > STARTUP_BUDGET:
+            print("Warning: First paint exceeded the {0}s startup budget".format(STARTUP_BUDGET))
+        if self.videoPath == "" and self.dataPath == "" and self.paneVideos == [] and not os.path.isfile(self.markerPath):
+            return
+        # Show placeholders until each part of the project is ready
+        if self.videoPath != "":
+            self.videoPlayer.setPlaceholder("Loading Video...")
+        panes = []
+        for path,offset in self.paneVideos:
+            panes.append(self.addVideoPane(path,offset,load=False))
+            panes[-1].setPlaceholder("Loading Video...")
+        if self.dataPath != "":
+            for dp in self.dataPlayers:
+                dp.setPlaceholder("Loading fNIRS Data...")
+        # Each part loads in parallel on the task pool, and is shown as soon as it is ready
+        if os.path.isfile(self.markerPath):
+            self.tasks.run(readMarkerCSV,self.markerPath,onDone=lambda result: self.addMarkers(*result),
+                           onError=lambda e: print("Error Restoring Markers:",e))
         if self.videoPath != "":
-            self.loadVideo(self.videoPath,loadAudio=False)
+            self.tasks.run(self.videoPlayer.loadVideo,self.videoPath,False,key="video",
+                           onDone=lambda _: self.videoPlayer.setPlaceholder(""),
+                           onError=lambda e: self.restoreFailed(self.videoPlayer,e))
+        for pane in panes:
+            self.tasks.run(pane.openVideo,pane.vid_path,onDone=lambda _,pane=pane: pane.setPlaceholder(""),
+                           onError=lambda e,pane=pane: self.restoreFailed(pane,e))
         if self.dataPath != "":
-            self.loadData(self.dataPath)
+            self.tasks.run(parseFNIRS,self.dataPath,self.chunkedStorage,self.blockCacheBytes,key="data",
+                           onDone=lambda parsed,path=self.dataPath: self.restoreData(path,parsed),
+                           onError=lambda e: self.restoreFailed(None,e))
+
+    def restoreFailed(self,pane,e):
+        """Show that part of the project could not be restored, pane is None for the fNIRS data"""
+        if pane is None:
+            print("Error Restoring fNIRS Data:",e)
+            for dp in self.dataPlayers:
+                dp.setPlaceholder("Error Loading fNIRS Data")
+        else:
+            print("Error Restoring Video:",e)
+            pane.setPlaceholder("Error Loading Video")
+
+    def restoreData(self,path,parsed):
+        """Show restored fNIRS data with the saved channel mask, creating dataplayers over several ticks"""
+        mask = self.channelMask
+        self.dataPath = path
+        self.applyFNIRS(parsed)
+        self.deleteAllDataplayers()
+        self.channelSelector.loadData(path)
+        self.channelMask = (mask+[0]*len(self.sensors))[:len(self.sensors)]
+        self.channelSelector.setMask(self.channelMask)
+        for lane in self.dataPlayers:# Move the lanes onto the new data's time scale
+            lane.loadData()
+            lane.draw()
+        self.populateQueue = list(self.channelLayout(self.channelMask))
+        self.root.after(1,self.populateNext)
+        self.scanQuality()
+
+    def scanQuality(self):
+        """Grade every channel of the loaded file in the background, results are cached with the recording"""
+        if self.dataPath == "" or self.values is None:
+            return
+        self.tasks.run(QualityScan.cached,self.dataPath,self.values,self.timebase,self.sensors,key="quality",
+                       onDone=self.applyQuality,onError=lambda e: print("Error Scanning Signal Quality:",e))
+
+    def applyQuality(self,channels):
+        """Show signal quality as channel badges and shaded regions on the dataplayers"""
+        if len(channels) != len(self.sensors):# Scan of other data
+            return
+        self.quality = channels
+        self.qualityEnds = [{kind:[end for _,end in channel[kind]] for kind in ["flat","motion"]} for channel in channels]
+        self.channelSelector.setQuality(channels)
+        for dp in self.dataPlayers:
+            dp.draw()
+
+    def populateNext(self):
+        """Create one restored dataplayer per tick so the window stays responsive"""
+        if self.populateQueue == []:
+            return
+        row,sensor_ids = self.populateQueue.pop(0)
+        dp = DataPlayer(self.root,self,row=row,column=0,sensor_ids=sensor_ids)
+        self.dataPlayers.append(dp)
+        dp.loadData()
+        dp.draw()
+        dp.bindKeys()
+        if self.populateQueue == []:
+            self.videoPlayer.updateDataplayers()
+        else:
+            self.root.after(1,self.populateNext)
 
     def saveConfig(self):
         """Save Project Settings to BDV_settings.ini"""
@@ -133,8 +307,21 @@ class Application():
         settings["videopath"] = self.videoPath
         settings["dataoffset"] = str(self.dataOffset)
         settings["colblindmode"] = str(self.colBlindMode)
+        settings["useproxies"] = str(self.useProxies)
+        settings["framecachemb"] = str(self.frameCache.budget/2**20)
+        settings["chunkedstorage"] = str(self.chunkedStorage)
+        settings["blockcachemb"] = str(self.blockCacheBytes/2**20)
+        settings["channelmask"] = "".join(str(int(c)) for c in self.channelMask)
+        settings["markerpath"] = self.markerPath
+        # Additional video panes, numbered after the main video
+        for name in [n for n in self.config.sections() if re.match(r"Video\d+$",n)]:
+            self.config.remove_section(name)
+        for i,pane in enumerate(self.videoPlayer.panes):
+            self.config["Video{0}".format(i+2)] = {"path":pane.vid_path,"offset":str(pane.offset)}
         with open(self.CONFIG_FILE,"w") as file:
             self.config.write(file)
+        if len(self.markers) or len(self.annotations) or os.path.isfile(self.markerPath):
+            writeMarkerCSV(self.markerPath,self.markers,self.annotations)
 
     def updateDataplayers(self,startTime):
         """Update dataplayers"""
@@ -154,7 +341,14 @@ class Application():
         self.root.config(menu=self.menubar)
         filemenu = tk.Menu(self.menubar,tearoff=False)
         filemenu.add_command(label="Edit Video/fNIRS Sources",command=self.launchImportWindow)
+        filemenu.add_command(label="Add Video Pane",command=self.launchVideoPaneWindow)
+        filemenu.add_command(label="Remove Video Panes",command=self.removeVideoPanes)
         filemenu.add_command(label="Synchronise Video/fNIRS",command=self.launchSyncToolWindow)
+        filemenu.add_command(label="Live Acquisition",command=self.launchLiveWindow)
+        filemenu.add_command(label="Import Markers (.csv)",command=self.launchMarkerImportWindow)
+        filemenu.add_command(label="Epoch Average",command=self.launchEpochWindow)
+        filemenu.add_command(label="Connectivity",command=self.launchConnectivityWindow)
+        filemenu.add_command(label="Frame Cache Statistics",command=lambda: self.popup("Frame Cache",self.frameCache.stats(),geom="250x140"))
         filemenu.add_command(label="Help",command=self.launchHelpWindow)
         filemenu.add_command(label="Quit",command=self.quit)
         self.menubar.add_cascade(label="Project",menu=filemenu)
@@ -194,7 +388,7 @@ class Application():
 
     def launchHelpWindow(self):
         """Create a Window to Display Help"""
-        self.popup("Help",HELP,geom="350x200")
+        self.popup("Help",HELP,geom="350x355")
 
     def popup(self,title,text,geom="300x100",textcol="#000000"):
         """Create a Simple Popup"""
@@ -211,8 +405,13 @@ class Application():
     def quit(self):
         """Called when main root closed or quit via menubar"""
         self.unbind()
+        self.stopLive()
+        if self.filmstrip is not None:
+            self.filmstrip.thumbnails.close()
         self.videoPlayer.stop()
         self.saveConfig()
+        self.tasks.shutdown()
+        self.videoPlayer.pool.shutdown(wait=False)
         self.root.destroy()
 
     def launchImportWindow(self):
@@ -227,108 +426,306 @@ class Application():
         self.videoPlayer.pause()
         self.w_synctool = SyncToolWindow(self)
 
+    def launchVideoPaneWindow(self):
+        """Launches the Add Video Pane Window"""
+        self.unbind()
+        self.videoPlayer.pause()
+        self.w_videopane = VideoPaneWindow(self)
+
+    def addVideoPane(self,path,offset=0,load=True):
+        """Add a video pane beside the main video, slaved to its clock"""
+        return self.videoPlayer.addPane(path,row=0,column=2+len(self.videoPlayer.panes),offset=offset,load=load)
+
+    def removeVideoPanes(self):
+        """Remove all additional video panes"""
+        self.videoPlayer.removePanes()
+
+    def launchMarkerImportWindow(self):
+        """Launches the Marker Importing Interface"""
+        self.unbind()
+        self.videoPlayer.pause()
+        self.w_markers = MarkerImportWindow(self)
+
+    def addMarkers(self,markers,annotations):
+        """Add (time, label) markers and (start, end, label) annotations in bulk"""
+        if markers:
+            self.markers.extend([m[0] for m in markers],[m[1] for m in markers])
+        if annotations:
+            self.annotations.extend(annotations)
+        for dp in self.dataPlayers:
+            dp.draw()
+        self.refreshEpochs()
+
+    def select(self,start,end):
+        """Select a range of data time, statistics are shown once its channels' prefix sums are built"""
+        self.selection = [start,end]
+        channels = sorted({c for dp in self.dataPlayers for c in dp.sensor_ids})
+        if self.values is not None and not self.rangeStats.has(self.values,channels):
+            self.tasks.run(self.rangeStats.build,self.values,self.timebase,channels,key="rangestats",
+                           onDone=lambda _: self.drawSelection(),onError=self.selectionFailed)
+        self.drawSelection()
+
+    def selectionFailed(self,e):
+        print("Error Building Range Statistics:",e)
+        self.clearSelection()
+
+    def clearSelection(self):
+        self.selection = None
+        self.drawSelection()
+
+    def drawSelection(self):
+        for dp in self.dataPlayers:
+            dp.drawSelection()
+
+    def currentTime(self):
+        """Get the data time (s) at the scrubber"""
+        if self.live is not None and self.values is self.live.buffer:
+            return self.live.shown/self.samplerate
+        if self.videoPlayer.isPlaying():
+            return self.videoPlayer.now()-self.videoPlayer.startTimestamp+self.dataOffset
+        return self.videoPlayer.progress+self.dataOffset
+
+    def launchConnectivityWindow(self):
+        """Launches the Connectivity View, which stays open alongside the dataplayers"""
+        if self.connectivityWindow is not None:
+            self.connectivityWindow.root.lift()
+            return
+        self.connectivityWindow = ConnectivityWindow(self)
+
+    def launchEpochWindow(self):
+        """Launches the Epoch Averaging View, which stays open alongside the dataplayers"""
+        if self.epochWindow is not None:
+            self.epochWindow.root.lift()
+            return
+        self.epochWindow = EpochWindow(self)
+
+    def refreshEpochs(self):
+        """Recompute the epoch average if its view is open"""
+        if self.epochWindow is not None:
+            self.epochWindow.update()
+
+    def jumpMarker(self,event,direction=1):
+        """Seek to the next (direction 1) or previous (direction -1) marker or annotation"""
+        if self.deferIfBusy(lambda: self.jumpMarker(event,direction)):
+            return
+        now = self.currentTime()
+        if direction > 0:
+            found = [t for t in [self.markers.nextAfter(now+0.01),self.annotations.nextAfter(now+0.01)] if t is not None]
+            target = min(found) if found else None
+        else:
+            found = [t for t in [self.markers.previousBefore(now-0.01),self.annotations.previousBefore(now-0.01)] if t is not None]
+            target = max(found) if found else None
+        if target is None:
+            return
+        with self.controlLock:
+            self.videoPlayer.pause()
+            self.videoPlayer.seek(target-self.dataOffset)
+            self.videoPlayer.pause()
+            self.videoPlayer.play()
+
+    def launchLiveWindow(self):
+        """Launches the Live Acquisition Window"""
+        self.unbind()
+        self.videoPlayer.pause()
+        self.w_live = LiveWindow(self)
+
+    def startLive(self,target,samplerate,seconds):
+        """Follow a recording in progress, replacing the loaded fNIRS data"""
+        self.stopLive()
+        self.live = LiveSession(self,openLiveSource(target),samplerate,seconds)
+        self.live.start()
+
+    def stopLive(self):
+        """Stop following a live recording"""
+        if self.live is not None:
+            self.live.stop()
+            self.live = None
+
     def deleteAllDataplayers(self):
-        """Removes Dataplayers"""
+        """Removes Dataplayers, except the audio and filmstrip lanes"""
+        lanes = [self.audioLane,self.filmstrip]
         # Remove dataplayers
         for dp in self.dataPlayers:
+            if dp in lanes:
+                continue
             dp.unbind()# Unbind GUI
+            self.redrawScheduler.forget(dp)
             dp.c.destroy()# Destroy canvas objects
-        self.dataPlayers = []
+        self.dataPlayers = [dp for dp in self.dataPlayers if dp in lanes]
+
+    def removeLane(self,lane):
+        """Remove a lane from the dataplayers"""
+        lane.unbind()
+        self.redrawScheduler.forget(lane)
+        lane.c.destroy()
+        self.dataPlayers.remove(lane)
+
+    def addLane(self,lane):
+        """Show a lane on the dataplayers' time axis"""
+        lane.loadData()
+        self.dataPlayers.append(lane)
+        lane.bindKeys()
+        lane.draw()
+
+    def setAudioEnvelope(self,envelope):
+        """Show the waveform of the loaded audio, or remove it if envelope is None"""
+        if self.audioLane is not None:
+            self.removeLane(self.audioLane)
+            self.audioLane = None
+        if envelope is not None:
+            self.audioLane = AudioLane(self.root,self,envelope)
+            self.addLane(self.audioLane)
+
+    def setFilmstrip(self,path,duration):
+        """Show thumbnails of the main video above the dataplayers, built in the background"""
+        if self.filmstrip is not None:
+            self.filmstrip.thumbnails.close()
+            self.removeLane(self.filmstrip)
+            self.filmstrip = None
+        try:
+            thumbnails = ThumbnailCache(path,FilmstripLane.HEIGHT*self.videoPlayer.w//self.videoPlayer.h,FilmstripLane.HEIGHT,
+                                        self.videoPlayer.fps)
+        except OSError as e:
+            print("Error Opening Thumbnail Cache:",e)
+            return
+        self.filmstrip = FilmstripLane(self.root,self,thumbnails,duration)
+        thumbnails.onReady = lambda: self.tasks.call(self.filmstrip.draw) if self.filmstrip is not None else None
+        self.addLane(self.filmstrip)
     
-    def reconfigureChannels(self,dataPath,channels):
-        """Given dataPath to xml fNIRS file, and a boolean mask (channels),
-            destroy and recreate all necessary data players"""
-        self.hideMenu()
-        self.deleteAllDataplayers()
+    def channelLayout(self,channels):
+        """Yield (row, sensor_ids) of each dataplayer needed to display a boolean mask (channels)"""
         i = 0
         while i < len(channels):# For each channel
             sensor_ids = []
             for j in [0,1]:# For Oxy- and Deoxy-Haemoglobin Channels
-                if channels[i+j]:# If Channel set to display
+                if i+j < len(channels) and channels[i+j]:# If Channel set to display
                     sensor_ids.append(i+j)
             if len(sensor_ids):# If visible part
-                # Create a dataplayer with configured sensors
-                self.dataPlayers.append(DataPlayer(self.root,self,row=i+1,column=0,sensor_ids=sensor_ids))
+                yield (i+2,sensor_ids)# Row 1 is the filmstrip
             i += 2
-        self.loadData(dataPath,resetChannelSelector=False)# Load data into dataplayers
+
+    def reconfigureChannels(self,dataPath,channels):
+        """Given dataPath to xml fNIRS file, and a boolean mask (channels),
+            destroy and recreate all necessary data players"""
+        self.hideMenu()
+        self.deleteAllDataplayers()
+        self.populateQueue = []# Cancel any dataplayers still being restored
+        self.channelMask = list(channels)
+        for row,sensor_ids in self.channelLayout(channels):
+            # Create a dataplayer with configured sensors
+            self.dataPlayers.append(DataPlayer(self.root,self,row=row,column=0,sensor_ids=sensor_ids))
+        if dataPath != self.dataPath or self.values is None:# Only parse if not already loaded
+            self.loadData(dataPath,resetChannelSelector=False)
+        else:
+            for dp in self.dataPlayers:
+                dp.loadData()
+                dp.draw()
         self.videoPlayer.updateDataplayers()
         self.bindDPHotkeys()
         self.showMenu()
+        self.refreshEpochs()
 
     def loadData(self,dataPath,resetChannelSelector=True):
         """Load fNIRS data from path"""
+        self.applyData(dataPath,parseFNIRS(dataPath,self.chunkedStorage,self.blockCacheBytes),resetChannelSelector)
+
+    def applyData(self,dataPath,parsed,resetChannelSelector=True):
+        """Show fNIRS data parsed by parseFNIRS, call from the Tk thread"""
+        self.stopLive()
         self.dataPath = dataPath
-        self.loadFNIRS(dataPath)
+        self.applyFNIRS(parsed)
         if resetChannelSelector:# Remove all dataplayers and import new channel configuration
             self.deleteAllDataplayers()
+            self.populateQueue = []
+            self.channelMask = [0]*len(self.sensors)
             self.channelSelector.loadData(dataPath)
         for dp in self.dataPlayers:
             dp.loadData()
             dp.draw()
+        self.scanQuality()
 
     def loadVideo(self,path,loadAudio=False):
         """Load Video From Path, Use Cached Audio if loadAudio is False"""
         self.videoPlayer.loadVideo(path,loadAudio=loadAudio)
         self.videoPath = path
 
+    def deferIfBusy(self,control):
+        """If another control is running, retry control shortly rather than dropping the key press"""
+        if self.controlLock.locked():
+            self.root.after(self.CONTROL_RETRY_MS,control)
+            return True
+        return False
+
     def play(self,event=None):
         """Play associated media and data players"""
-        if self.controlLock.locked():
+        if self.deferIfBusy(self.play):
             return
-        self.controlLock.acquire()
-        self.videoPlayer.play()
-        self.controlLock.release()
+        with self.controlLock:
+            self.videoPlayer.play()
 
     def pause(self,event=None):
         """"Pause associated media and data players"""
-        if self.controlLock.locked():
+        if self.deferIfBusy(self.pause):
             return
-        self.controlLock.acquire()
-        self.videoPlayer.pause()
-        for dp in self.dataPlayers:
-            dp.update(self.videoPlayer.startTimestamp)
-        self.controlLock.release()
+        with self.controlLock:
+            self.videoPlayer.pause()
+            for dp in self.dataPlayers:
+                dp.update(self.videoPlayer.startTimestamp)
         
     def stop(self,event=None):
         """Stop associated media and data players"""
-        if self.controlLock.locked():
+        if self.deferIfBusy(self.stop):
             return
-        self.controlLock.acquire()
-        self.videoPlayer.stop()
-        self.videoPlayer.updateDataplayers()
-        self.controlLock.release()
+        with self.controlLock:
+            self.videoPlayer.stop()
+            self.videoPlayer.updateDataplayers()
 
     def zoom(self,event):
-        """Zoom in/out on dataplayers with scrollwheel"""
-        if self.measurements == None:
+        """Zoom in/out on dataplayers with scrollwheel, rendering is left to the redraw scheduler"""
+        if self.measurements == None or len(self.dataPlayers) == 0:
             return
-        if self.controlLock.locked():
+        if self.deferIfBusy(lambda: self.zoom(event)):
             return
-        self.controlLock.acquire()
-        if len(self.dataPlayers) > 0:
-            dp = self.dataPlayers[0]
+        with self.controlLock:
+            # Take the scale from an fNIRS dataplayer, not a lane at the front of the list
+            dp = next((dp for dp in self.dataPlayers if not isinstance(dp,TimelineLane)),self.dataPlayers[0])
             dp.zoom(event.delta*2/120)
             scalex,scaley = dp.getScale()
-        # Do functions together
-        for dp in self.dataPlayers:
-            dp.setScaleX(scalex[0],scalex[1])
-        for dp in self.dataPlayers:
-            dp.draw()
-        for dp in self.dataPlayers:# Update canvas together
-            dp.redraw()
-        self.controlLock.release()
+            # Only the scale is changed here, so a fast scroll coalesces into one render per frame
+            for dp in self.dataPlayers:
+                dp.setScaleX(scalex[0],scalex[1])
+                dp.draw()
         
     def skipFor(self,event,t=10):
         """Skip t seconds forward"""
-        if self.controlLock.locked():
+        if self.deferIfBusy(lambda: self.skipFor(event,t)):
             return
-        self.controlLock.acquire()
-        self.videoPlayer.pause()
-        self.videoPlayer.seek(self.videoPlayer.progress+t)
-        self.videoPlayer.pause()
-        self.videoPlayer.play()
-        self.controlLock.release()
+        with self.controlLock:
+            self.videoPlayer.pause()
+            self.videoPlayer.seek(self.videoPlayer.progress+t)
+            self.videoPlayer.pause()
+            self.videoPlayer.play()
         
+    def stepFrame(self,event,frames=1):
+        """Pause and step the main video by a number of frames"""
+        if self.videoPlayer.isEmpty() or self.deferIfBusy(lambda: self.stepFrame(event,frames)):
+            return
+        with self.controlLock:
+            self.videoPlayer.pause()
+            self.videoPlayer.step(frames)
+            self.videoPlayer.updateDataplayers()
+
+    def changeRate(self,event,step=1):
+        """Step the playback rate up or down through VideoPlayer.RATES"""
+        if self.videoPlayer.isEmpty() or self.deferIfBusy(lambda: self.changeRate(event,step)):
+            return
+        with self.controlLock:
+            rates = VideoPlayer.RATES
+            i = min(max(0,rates.index(self.videoPlayer.rate)+step),len(rates)-1)
+            self.videoPlayer.setRate(rates[i])
+            self.root.title("Brain Data Visualisation Tool"+(" ({0}x)".format(rates[i]) if rates[i] != 1 else ""))
+            self.videoPlayer.updateDataplayers()
+
     def bindHotkeys(self):
         """Bind hotkeys to root"""
         self.root.bind("s",self.pause)
@@ -336,11 +733,17 @@ class Application():
         self.root.bind("x",self.stop)
         self.root.bind("<Right>",lambda event, t=10: self.skipFor(event,t=t))
         self.root.bind("<Left>",lambda event, t=-10: self.skipFor(event,t=t))
+        self.root.bind("<period>",lambda event: self.stepFrame(event,frames=1))
+        self.root.bind("<comma>",lambda event: self.stepFrame(event,frames=-1))
+        self.root.bind("n",lambda event: self.jumpMarker(event,direction=1))
+        self.root.bind("b",lambda event: self.jumpMarker(event,direction=-1))
+        self.root.bind("<bracketright>",lambda event: self.changeRate(event,step=1))
+        self.root.bind("<bracketleft>",lambda event: self.changeRate(event,step=-1))
         self.bindDPHotkeys()
 
     def unbind(self):
         """Unbind Hotkeys"""
-        for k in ["s","p","x","<Right>","<Left>"]:
+        for k in ["s","p","x","<Right>","<Left>","<period>","<comma>","n","b","<bracketright>","<bracketleft>"]:
             self.root.unbind(k)
         for dp in self.dataPlayers:
             dp.unbind()
@@ -355,14 +758,116 @@ class Application():
         self.bindHotkeys()
         self.root.mainloop()
 
-    def loadFNIRS(self,filepath):
-        """Load fNIRS data from .xml file into app"""
-        self.tree = ET.parse(filepath)
-        self.data = self.tree.getroot().find("data")
-        self.samplerate = float(self.tree.getroot().find('device').find('samplerate').text)
-        self.sensors = [i.text for i in self.tree.getroot().find('columns')]
+    def applyFNIRS(self,parsed):
+        """Set fNIRS data parsed by parseFNIRS as the app's data"""
+        self.tree = parsed["tree"]
+        self.data = parsed["data"]
+        self.samplerate = parsed["samplerate"]
+        self.sensors = parsed["sensors"]
         self.sensorMask = [True]*len(self.sensors)
-        self.measurements = len(self.tree.getroot().find('data'))
+        self.measurements = parsed["measurements"]
+        self.values = parsed["values"]
+        self.timebase = parsed.get("timebase") or Timebase(self.samplerate,parsed["timestamps"])
+        self.spectrograms.clear()
+        self.rangeStats.clear()
+        self.selection = None
+        self.quality = None
+        self.tasks.cancel("quality")
+
+
+def parseFNIRS(filepath,chunked=False,cacheBytes=64*2**20):
+    """Parse an fNIRS file with the loader registered for its extension, safe to run off the Tk thread.
+        If chunked, formats that are read into memory are instead kept on disk as a ChunkedStore"""
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension not in LOADERS:
+        raise ValueError("Unsupported fNIRS file type '{0}', expected one of {1}".format(extension,", ".join(sorted(LOADERS))))
+    return LOADERS[extension](filepath,chunked,cacheBytes)
+
+def openChunked(filepath,cacheBytes):
+    """Dataset of a recording converted to a ChunkedStore, only the blocks being viewed are read"""
+    store = ChunkedStore.open(filepath,cacheBytes)
+    return {"tree":None,"data":None,"samplerate":store.samplerate,"sensors":store.sensors,
+            "measurements":len(store),"values":store,"timestamps":None,"timebase":store.timebase}
+
+def parseXML(filepath,chunked=False,cacheBytes=64*2**20):
+    """Parse the vendor .xml export (<device>, <columns>, <data>)"""
+    if chunked:
+        return openChunked(filepath,cacheBytes)
+    tree = ET.parse(filepath)
+    data = tree.getroot().find("data")
+    sensors = [i.text for i in tree.getroot().find('columns')]
+    # Parse once into an array, missing readings are stored as NaN
+    values = np.full((len(data),len(sensors)),np.nan)
+    for i,row in enumerate(data):
+        cells = [float(cell.text or "nan") for cell in row][:len(sensors)]
+        values[i,:len(cells)] = cells
+    values,sensors,timestamps = splitTimestamps(values,sensors)
+    return {"tree":tree,"data":data,"samplerate":float(tree.getroot().find('device').find('samplerate').text),
+            "sensors":sensors,"measurements":len(data),"values":values,"timestamps":timestamps}
+
+def parseCSV(filepath,chunked=False,cacheBytes=64*2**20):
+    """Parse a .csv export in the format LineReader streams: optional '# samplerate: <Hz>' lines,
+        a header of sensor names, then one row per sample. The rows are converted by numpy in one pass"""
+    if chunked:
+        return openChunked(filepath,cacheBytes)
+    with open(filepath,"r") as file:
+        text = file.read()
+    reader = LineReader()
+    offset = 0
+    while reader.sensors is None:# Metadata lines, then the header
+        if offset >= len(text):
+            raise ValueError("No header found in {0}".format(filepath))
+        end = text.find("\n",offset)+1 or len(text)
+        reader.feed(text[offset:end].rstrip("\n")+"\n")
+        offset = end
+    sensors = reader.sensors
+    body = re.sub(r"\n\s*\n","\n",text[offset:].replace("\r","").strip())# Drop blank lines
+    lines = body.split("\n") if body else []
+    values = None
+    if all(line.count(",") == len(sensors)-1 for line in lines):# Only rectangular text can be read in one pass
+        body = re.sub(r"(?m)(^|,)[ \t]*(?=,|$)",r"\1nan",body)# Empty cells are missing readings
+        try:
+            values = np.fromstring(body.replace("\n",","),sep=",") if lines else np.empty(0)
+        except ValueError:# Comments or repeated headers in the body
+            values = None
+        if values is not None and values.size != len(lines)*len(sensors):# Older numpy stops early instead
+            values = None
+    if values is None:# Ragged rows, comments or headers in the body, parse line by line
+        values = np.array(reader.feed(text[offset:]+"\n"),dtype=np.float64).reshape(-1,len(sensors))
+    else:
+        values = values.reshape(len(lines),len(sensors))
+    values,sensors,timestamps = splitTimestamps(values,sensors)
+    samplerate = reader.samplerate
+    if samplerate is None:
+        if timestamps is None or len(timestamps) < 2 or not timestamps[-1] > timestamps[0]:
+            raise ValueError("{0} needs a '# samplerate: <Hz>' line or a time column".format(filepath))
+        samplerate = (len(timestamps)-1)/(timestamps[-1]-timestamps[0])
+    return {"tree":None,"data":None,"samplerate":samplerate,"sensors":sensors,
+            "measurements":len(values),"values":values,"timestamps":timestamps}
+
+def parseSNIRF(filepath,chunked=False,cacheBytes=64*2**20):
+    """Open a SNIRF (HDF5) file, samples stay on disk and only the rows being viewed are read"""
+    store = SnirfStore(filepath)
+    return {"tree":None,"data":None,"samplerate":store.samplerate,"sensors":store.sensors,
+            "measurements":len(store),"values":store,"timestamps":store.timestamps}
+
+# fNIRS loaders by file extension, each takes (filepath, chunked, cacheBytes) and returns the dataset
+# applyFNIRS expects, a new format only needs an entry here
+LOADERS = {".xml":parseXML,".csv":parseCSV,".snirf":parseSNIRF,".h5":parseSNIRF,".hdf5":parseSNIRF}
+
+def splitTimestamps(values,sensors):
+    """Separate an optional timestamp column from sensor columns, sorting rows into time order"""
+    match_time = re.compile(MATCH_TIME,re.IGNORECASE)
+    for k,name in enumerate(sensors):
+        if name and match_time.match(name):
+            timestamps = values[:,k].copy()
+            values = np.delete(values,k,axis=1)
+            sensors = sensors[:k]+sensors[k+1:]
+            if np.any(np.diff(timestamps) < 0):# Out of order rows
+                order = np.argsort(timestamps,kind="stable")
+                timestamps,values = timestamps[order],values[order]
+            return values,sensors,timestamps
+    return values,sensors,None
 
 
 class ImportDataWindow():
@@ -382,22 +887,49 @@ class ImportDataWindow():
         self.vidPathEntry.insert(tk.END,self.app.videoPath)
         self.loadAudio = tk.IntVar()
         tk.Checkbutton(self.root,text="Use Cached Audio",variable=self.loadAudio).grid(row=2,column=0,sticky=tk.NW)
-        tk.Label(self.root,text="File Path to fNIRS (.xml) Data: ").grid(row=3,column=0,sticky=tk.NW)
+        self.useProxies = tk.IntVar(value=int(self.app.useProxies))
+        tk.Checkbutton(self.root,text="Build Low-Resolution Proxy for Playback",variable=self.useProxies).grid(row=2,column=0,sticky=tk.NE)
+        tk.Label(self.root,text="File Path to fNIRS (.xml, .csv or .snirf) Data: ").grid(row=3,column=0,sticky=tk.NW)
         self.fnirsPathEntry = tk.Entry(self.root,width=120)
         self.fnirsPathEntry.grid(row=4,column=0,sticky=tk.NW)
         self.fnirsPathEntry.insert(tk.END,self.app.dataPath)
 ##        self.fnirsPathEntry.insert(tk.END,data_path_gyro) # For Testing
+        self.chunked = tk.IntVar(value=int(self.app.chunkedStorage))
+        tk.Checkbutton(self.root,text="Out-of-Core Storage (Recordings Larger than RAM)",variable=self.chunked).grid(row=5,column=0,sticky=tk.NE)
         self.okbtn = tk.Button(self.root,text="Confirm",command=self.onSubmit).grid(row=5,column=0,sticky=tk.NW)
         self.root.protocol("WM_DELETE_WINDOW",self.app.bindHotkeys)
         self.root.mainloop()
-    def loadAudioThread(self):
-        """Load Audio and Restore Control"""
-        loadAudio = not self.loadAudio.get()
-        self.focus.after(1,self.flabel.config,{"text":"Importing Video"+["",", Preparing Audio"][loadAudio]})
-        self.app.loadVideo(self.app.videoPath,loadAudio=loadAudio)# Invert Boolean
-        self.focus.after(1,self.flabel.config,{"text":"Importing fNIRS Data"})
-        self.app.loadData(self.app.dataPath)
-        self.root.after(1,self.threadComplete)
+    def startImport(self,vidpath,xmlpath):
+        """Load the video and parse the fNIRS data in parallel on the task pool"""
+        loadAudio = not self.loadAudio.get()# Invert Boolean
+        video = "Video"+["",", Audio"][loadAudio]
+        self.remaining = [video,"fNIRS Data"]
+        self.flabel.config(text="Importing "+" and ".join(self.remaining))
+        tasks = self.app.tasks
+        tasks.run(self.app.loadVideo,vidpath,loadAudio,key="video",
+                  onDone=lambda _: self.partComplete(video),onError=self.importFailed)
+        tasks.run(parseFNIRS,xmlpath,self.app.chunkedStorage,self.app.blockCacheBytes,key="data",
+                  onDone=lambda parsed: self.dataParsed(xmlpath,parsed),onError=self.importFailed)
+    def dataParsed(self,xmlpath,parsed):
+        """Show the parsed fNIRS data, in the Tk thread"""
+        self.app.applyData(xmlpath,parsed)
+        self.partComplete("fNIRS Data")
+    def partComplete(self,part):
+        """Called in the Tk thread as each part finishes importing"""
+        if part not in self.remaining:# Import already failed
+            return
+        self.remaining.remove(part)
+        if self.remaining == []:
+            self.threadComplete()
+        else:
+            self.flabel.config(text="Importing "+" and ".join(self.remaining))
+    def importFailed(self,e):
+        """Called in the Tk thread if a part fails to import"""
+        print("Error Importing:",e)
+        if self.remaining != []:
+            self.remaining = []
+            self.threadComplete()
+            self.flabel.config(text="Import Failed\n{0}".format(e))
     def threadComplete(self):
         """Called when Thread Completed"""
         self.flabel.config(text="Import Complete")
@@ -425,8 +957,9 @@ class ImportDataWindow():
             # Update Project Video and Data Paths
             self.app.dataPath = xmlpath
             self.app.videoPath = vidpath
-            # Run Lengthy Operation in Thread
-            threading.Thread(target=self.loadAudioThread,daemon=True).start()
+            self.app.useProxies = bool(self.useProxies.get())
+            self.app.chunkedStorage = bool(self.chunked.get())
+            self.startImport(vidpath,xmlpath)
         else:
             # Jump to End of Import Sequence
             self.threadComplete()
@@ -454,6 +987,13 @@ class SyncToolWindow():
         colBlindCheck.grid(row=3,column=0,sticky=tk.NW)
         if self.app.colBlindMode:
             colBlindCheck.select()
+        # Offsets of additional video panes
+        self.paneEntries = []
+        for i,pane in enumerate(self.app.videoPlayer.panes):
+            tk.Label(self.root,text="Video {0} Offset (s):".format(i+2)).grid(row=2*i,column=1)
+            self.paneEntries.append(tk.Entry(self.root))
+            self.paneEntries[-1].grid(row=2*i+1,column=1,sticky=tk.NW)
+            self.paneEntries[-1].insert(0,pane.offset)
         self.okbtn = tk.Button(self.root,text="Confirm",command=self.onSubmit).grid(row=4,column=0,sticky=tk.NW)
         self.root.protocol("WM_DELETE_WINDOW",self.app.bindHotkeys)
         self.root.mainloop()
@@ -462,26 +1002,442 @@ class SyncToolWindow():
         offset = self.offsetEntry.get()
         try:
             offset = float(offset)
+            paneOffsets = [float(e.get()) for e in self.paneEntries]
         except:# Display Error for Erroneous Input and Abort
             self.errLabel.config(text="Invalid Input!")
             return
         self.app.dataOffset = offset
+        for pane,paneOffset in zip(self.app.videoPlayer.panes,paneOffsets):
+            pane.offset = paneOffset
+            pane.requested = None# Redecode at the new offset
         self.root.destroy()
         colblind = self.colblindFriendly.get()
         self.app.colBlindMode = colblind
         # Update Dataplayers to Apply Offset and Colour Scheme
         if len(self.app.dataPlayers) > 0:# Prevent error if no dataplayers
-            self.app.updateDataplayers(time.time()-self.app.dataPlayers[0].progress)
+            self.app.updateDataplayers(self.app.videoPlayer.now()-self.app.dataPlayers[0].progress)
         for dp in self.app.dataPlayers:
             dp.draw()
-        for dp in self.app.dataPlayers:
-            dp.redraw()
         self.app.bindHotkeys()
         self.root.grab_release()
 
+class VideoPaneWindow():
+    def __init__(self,app):
+        """Create a Window to Add a Video Pane Played in Sync with the Main Video"""
+        # Keep Reference to Main Window
+        self.app = app
+        self.root = tk.Toplevel()
+        self.root.grab_set()
+        self.root.title("Add Video")
+        self.root.geometry("750x200")
+        self.root.iconbitmap(ICON_PATH)
+        # Create, Grid, and Bind Widgets
+        tk.Label(self.root,text="File Path to Video Data: ").grid(row=0,column=0,sticky=tk.NW)
+        self.vidPathEntry = tk.Entry(self.root,width=120)
+        self.vidPathEntry.grid(row=1,column=0,sticky=tk.NW)
+        tk.Label(self.root,text="Offset Relative to Main Video (s):").grid(row=2,column=0,sticky=tk.NW)
+        self.offsetEntry = tk.Entry(self.root)
+        self.offsetEntry.grid(row=3,column=0,sticky=tk.NW)
+        self.offsetEntry.insert(0,"0")
+        self.errLabel = tk.Label(self.root,fg=self.app.getOxyCol(),text="")
+        self.errLabel.grid(row=4,column=0)
+        self.okbtn = tk.Button(self.root,text="Confirm",command=self.onSubmit).grid(row=5,column=0,sticky=tk.NW)
+        self.root.protocol("WM_DELETE_WINDOW",self.close)
+        self.root.mainloop()
+    def onSubmit(self):
+        """Called when Submit Button is Pressed"""
+        vidpath = sanitize_filepath(self.vidPathEntry.get(),platform='auto')
+        try:
+            offset = float(self.offsetEntry.get())
+        except ValueError:# Display Error for Erroneous Input and Abort
+            self.errLabel.config(text="Invalid Input!")
+            return
+        if not os.path.isfile(vidpath):
+            self.errLabel.config(text="File does not exist!")
+            return
+        self.app.addVideoPane(vidpath,offset)
+        self.close()
+    def close(self):
+        """Restore Control and Close"""
+        self.app.bindHotkeys()
+        self.root.grab_release()
+        self.root.destroy()
+
+class LiveWindow():
+    def __init__(self,app):
+        """Create a Window for Following a Recording in Progress"""
+        # Keep Reference to Main Window
+        self.app = app
+        self.root = tk.Toplevel()
+        self.root.grab_set()
+        self.root.title("Live Acquisition")
+        self.root.geometry("750x200")
+        self.root.iconbitmap(ICON_PATH)
+        # Create, Grid, and Bind Widgets
+        tk.Label(self.root,text="Growing .xml/.csv Export, tcp://host:port or udp://host:port: ").grid(row=0,column=0,sticky=tk.NW)
+        self.sourceEntry = tk.Entry(self.root,width=120)
+        self.sourceEntry.grid(row=1,column=0,sticky=tk.NW)
+        self.sourceEntry.insert(tk.END,"tcp://127.0.0.1:5555")
+        tk.Label(self.root,text="Sample Rate (Hz), if not given by the source:").grid(row=2,column=0,sticky=tk.NW)
+        self.rateEntry = tk.Entry(self.root)
+        self.rateEntry.grid(row=3,column=0,sticky=tk.NW)
+        self.rateEntry.insert(0,"10")
+        tk.Label(self.root,text="Buffer Length (s):").grid(row=4,column=0,sticky=tk.NW)
+        self.bufferEntry = tk.Entry(self.root)
+        self.bufferEntry.grid(row=5,column=0,sticky=tk.NW)
+        self.bufferEntry.insert(0,"600")
+        self.errLabel = tk.Label(self.root,fg=self.app.getOxyCol(),text="")
+        self.errLabel.grid(row=6,column=0)
+        tk.Button(self.root,text="Start",command=self.onSubmit).grid(row=7,column=0,sticky=tk.NW)
+        tk.Button(self.root,text="Stop Live Mode",command=self.onStop).grid(row=7,column=0,sticky=tk.NE)
+        self.root.protocol("WM_DELETE_WINDOW",self.close)
+        self.root.mainloop()
+    def onSubmit(self):
+        """Called when Start Button is Pressed"""
+        try:
+            samplerate = float(self.rateEntry.get())
+            seconds = float(self.bufferEntry.get())
+            assert samplerate > 0 and seconds > 0
+            self.app.startLive(self.sourceEntry.get(),samplerate,seconds)
+        except (ValueError,AssertionError):# Display Error for Erroneous Input and Abort
+            self.errLabel.config(text="Invalid Input!")
+            return
+        except OSError as e:
+            self.errLabel.config(text="Could not open source: {0}".format(e))
+            return
+        self.close()
+    def onStop(self):
+        """Called when Stop Button is Pressed"""
+        self.app.stopLive()
+        self.close()
+    def close(self):
+        """Restore Control and Close"""
+        self.app.bindHotkeys()
+        self.root.grab_release()
+        self.root.destroy()
+
+class MarkerImportWindow():
+    def __init__(self,app):
+        """Create a Window to Import Markers and Annotations in Bulk"""
+        # Keep Reference to Main Window
+        self.app = app
+        self.root = tk.Toplevel()
+        self.root.grab_set()
+        self.root.title("Import Markers")
+        self.root.geometry("750x200")
+        self.root.iconbitmap(ICON_PATH)
+        # Create, Grid, and Bind Widgets
+        tk.Label(self.root,text="File Path to Markers (.csv), rows of time[,end][,label] in fNIRS time (s): ").grid(row=0,column=0,sticky=tk.NW)
+        self.pathEntry = tk.Entry(self.root,width=120)
+        self.pathEntry.grid(row=1,column=0,sticky=tk.NW)
+        self.errLabel = tk.Label(self.root,fg=self.app.getOxyCol(),text="")
+        self.errLabel.grid(row=2,column=0)
+        self.okbtn = tk.Button(self.root,text="Confirm",command=self.onSubmit).grid(row=3,column=0,sticky=tk.NW)
+        self.root.protocol("WM_DELETE_WINDOW",self.close)
+        self.root.mainloop()
+    def onSubmit(self):
+        """Called when Submit Button is Pressed"""
+        try:
+            markers,annotations = readMarkerCSV(self.pathEntry.get())
+        except (OSError,ValueError) as e:# Display Error and Abort
+            self.errLabel.config(text="Could not read markers: {0}".format(e))
+            return
+        self.app.addMarkers(markers,annotations)
+        self.close()
+    def close(self):
+        """Restore Control and Close"""
+        self.app.bindHotkeys()
+        self.root.grab_release()
+        self.root.destroy()
+
+class EpochWindow():
+    """Event-Locked Average of the Selected Channels around each Marker and Annotation Onset"""
+    W,H = 700,400# Plot size
+
+    def __init__(self,app):
+        """Create a Window Plotting Mean and Standard Error, Left Open while Markers are Added"""
+        self.app = app
+        self.averager = None
+        self.root = tk.Toplevel()
+        self.root.title("Epoch Average")
+        self.root.iconbitmap(ICON_PATH)
+        # Create, Grid, and Bind Widgets
+        controls = tk.Frame(self.root)
+        controls.grid(row=0,column=0,sticky=tk.NW)
+        self.entries = {}
+        for i,(name,default) in enumerate([("From (s)","-5"),("To (s)","20"),("Marker Label","")]):
+            tk.Label(controls,text=name).grid(row=0,column=2*i,sticky=tk.W)
+            self.entries[name] = tk.Entry(controls,width=12)
+            self.entries[name].insert(tk.END,default)
+            self.entries[name].grid(row=0,column=2*i+1,sticky=tk.W)
+            self.entries[name].bind("<Return>",lambda event: self.update())
+        self.baseline = tk.IntVar(value=1)
+        tk.Checkbutton(controls,text="Baseline Correct",variable=self.baseline,command=self.update).grid(row=0,column=6)
+        tk.Button(controls,text="Update",command=self.update).grid(row=0,column=7)
+        self.c = tk.Canvas(self.root,width=self.W,height=self.H,bg="#ffffff")
+        self.c.grid(row=1,column=0)
+        self.status = tk.Label(self.root,text="")
+        self.status.grid(row=2,column=0,sticky=tk.NW)
+        self.root.protocol("WM_DELETE_WINDOW",self.close)
+        self.update()
+
+    def onsets(self,label):
+        """Marker times and annotation starts, optionally only those with a label"""
+        onsets = [t for t,l in zip(self.app.markers.times,self.app.markers.labels) if label == "" or l == label]
+        onsets += [i[0] for i in self.app.annotations.intervals if label == "" or i[2] == label]
+        return np.sort(np.array(onsets,dtype=np.float64))
+
+    def update(self):
+        """Recompute and redraw, only the epochs are re-indexed as channels are loaded once"""
+        self.c.delete(tk.ALL)
+        try:
+            pre,post = float(self.entries["From (s)"].get()),float(self.entries["To (s)"].get())
+            assert post > pre
+        except (ValueError,AssertionError):
+            self.status.config(text="Invalid Window!")
+            return
+        if self.app.values is None:
+            self.status.config(text="No fNIRS Data Loaded")
+            return
+        if self.averager is None or self.averager.values is not self.app.values:
+            self.averager = EpochAverager(self.app.values,self.app.timebase)
+        cols = [c for c,m in enumerate(self.app.channelMask) if m]
+        onsets = self.onsets(self.entries["Marker Label"].get())
+        if not cols or not len(onsets):
+            self.status.config(text="Select channels and add markers to average")
+            return
+        times,mean,se,n = self.averager.average(onsets,cols,pre,post,self.baseline.get())
+        self.status.config(text="{0} of {1} events, {2} channels".format(n,len(onsets),len(cols)))
+        if n:
+            self.draw(times,mean,se,cols)
+
+    def draw(self,times,mean,se,cols):
+        """Plot each channel's mean with a shaded band of one standard error"""
+        lo,hi = np.nanmin(mean-np.nan_to_num(se)),np.nanmax(mean+np.nan_to_num(se))
+        if not np.isfinite(lo) or hi <= lo:
+            lo,hi = -1,1
+        def xy(t,v):
+            return (t-times[0])/(times[-1]-times[0])*self.W,self.H-(v-lo)/(hi-lo)*(self.H-20)-10
+        # Axes, with the onset marked
+        self.c.create_line(*xy(times[0],0),*xy(times[-1],0),fill="#bebebe",width=2)
+        x0 = xy(0,0)[0]
+        self.c.create_line(x0,0,x0,self.H,fill="#996600",dash=(3,3))
+        self.c.create_text(5,5,text=str(round(hi,3)),anchor=tk.NW)
+        self.c.create_text(5,self.H-5,text=str(round(lo,3)),anchor=tk.SW)
+        self.c.create_text(15,self.H-20,text="{0:g}s".format(times[0]),anchor=tk.SW)
+        self.c.create_text(self.W-5,self.H-20,text="{0:g}s".format(times[-1]),anchor=tk.SE)
+        for k,c in enumerate(cols):
+            col = self.app.getSensorCol(self.app.sensors[c])
+            ok = np.isfinite(mean[k])
+            if ok.sum() < 2:
+                continue
+            x,y = xy(times[ok],mean[k][ok])
+            upper = xy(times[ok],(mean[k]+np.nan_to_num(se[k]))[ok])[1]
+            lower = xy(times[ok],(mean[k]-np.nan_to_num(se[k]))[ok])[1]
+            band = np.column_stack([np.concatenate([x,x[::-1]]),np.concatenate([upper,lower[::-1]])]).ravel().tolist()
+            self.c.create_polygon(*band,fill=col,stipple="gray25",outline="")
+            self.c.create_line(*np.column_stack([x,y]).ravel().tolist(),fill=col,width=2)
+            if k < 12:# Legend
+                self.c.create_text(self.W-5,20+15*k,text=self.app.sensors[c],fill=col,anchor=tk.NE)
+
+    def close(self):
+        self.app.epochWindow = None
+        self.root.destroy()
+
+
+class EpochAverager():
+    """Event-Locked Epochs of a Recording, Sliced for all Channels at once with Fancy Indexing.
+        Sample stores are only read for the rows inside epochs, span by span"""
+    SPAN = 4096# Most rows fetched at once from a sample store
+
+    def __init__(self,values,timebase):
+        self.values = values
+        self.timebase = timebase
+
+    def gather(self,rows,cols):
+        """Get the samples of sorted unique rows of a sample store, NaN for any it no longer holds"""
+        samples = np.full((len(rows),len(cols)),np.nan)
+        i = 0
+        while i < len(rows):
+            j = np.searchsorted(rows,rows[i]+self.SPAN)# Rows within one fetch
+            first,block = fetchRows(self.values,int(rows[i]),int(rows[j-1])+1,cols)
+            index = rows[i:j]-first
+            held = (index >= 0)&(index < len(block))
+            samples[i:j][held] = block[index[held]]
+            i = j
+        return samples
+
+    def epochs(self,onsets,cols,pre,post):
+        """Slice (events x channels x samples) from pre to post seconds around each onset,
+            dropping events whose window leaves the recording. Returns the sample times and epochs"""
+        taus = np.arange(int(np.ceil(pre*self.timebase.samplerate)),int(np.floor(post*self.timebase.samplerate))+1)/self.timebase.samplerate
+        rows = self.timebase.rowAt(np.asarray(onsets)[:,None]+taus[None,:])# (events x samples)
+        first = fetchRows(self.values,0,1,cols[:1])[0]# Ring buffers drop their oldest rows
+        rows = rows[np.all((rows >= first)&(rows < len(self.values)),axis=1)]
+        if isinstance(self.values,np.ndarray):
+            return taus,self.values[rows[:,None,:],np.array(cols)[None,:,None]]
+        unique,inverse = np.unique(rows,return_inverse=True)
+        return taus,self.gather(unique,cols)[inverse.reshape(rows.shape)].transpose(0,2,1)
+
+    def average(self,onsets,cols,pre,post,baseline=True):
+        """Get sample times, the mean and standard error (channels x samples) and number of events.
+            Baseline correction subtracts each epoch's mean before the onset"""
+        taus,epochs = self.epochs(onsets,cols,pre,post)
+        if not len(epochs):
+            return taus,None,None,0
+        with warnings.catch_warnings():# Channels missing in every epoch give NaN
+            warnings.simplefilter("ignore",category=RuntimeWarning)
+            if baseline and (taus < 0).any():
+                epochs = epochs-np.nanmean(epochs[:,:,taus < 0],axis=2,keepdims=True)
+            mean = np.nanmean(epochs,axis=0)
+            count = np.sum(np.isfinite(epochs),axis=0)
+            se = np.nanstd(epochs,axis=0,ddof=1)/np.sqrt(count)
+        return taus,mean,se,len(epochs)
+
+
+class ConnectivityWindow():
+    """Correlation of every Channel Pair over a Sliding Window Centred on the Scrubber"""
+    SIZE = 500# Matrix size (px)
+    REFRESH_MS = 40# Follows the scrubber at display rate
+    # Blue through grey to red, for -1 to 1
+    COLOURMAP = np.array([np.interp(np.linspace(0,1,256),np.linspace(0,1,3),c) for c in
+                          zip((59,76,192),(221,221,221),(180,4,38))]).T.astype(np.uint8)
+
+    def __init__(self,app):
+        """Create a Window Showing the Channel x Channel Correlation Matrix, Left Open During Playback"""
+        self.app = app
+        self.rolling = None
+        self.shown = None# (data, window, row) last drawn
+        self.matrix = None
+        self.image = None# Keep a reference so Tk does not discard the image
+        self.root = tk.Toplevel()
+        self.root.title("Connectivity")
+        self.root.iconbitmap(ICON_PATH)
+        # Create, Grid, and Bind Widgets
+        controls = tk.Frame(self.root)
+        controls.grid(row=0,column=0,sticky=tk.NW)
+        tk.Label(controls,text="Window (s)").grid(row=0,column=0)
+        self.windowEntry = tk.Entry(controls,width=8)
+        self.windowEntry.insert(tk.END,"30")
+        self.windowEntry.grid(row=0,column=1)
+        self.c = tk.Canvas(self.root,width=self.SIZE,height=self.SIZE,bg="#ffffff")
+        self.c.grid(row=1,column=0)
+        self.c.bind("<Motion>",self.describe)
+        self.status = tk.Label(self.root,text="")
+        self.status.grid(row=2,column=0,sticky=tk.NW)
+        self.root.protocol("WM_DELETE_WINDOW",self.close)
+        self.refresh()
+
+    def refresh(self):
+        """Step the rolling sums to the scrubber and redraw if the window moved"""
+        if self.app.connectivityWindow is not self:
+            return
+        self.root.after(self.REFRESH_MS,self.refresh)
+        if self.app.values is None or len(self.app.sensors) < 2:
+            self.status.config(text="No fNIRS Data Loaded")
+            return
+        try:
+            window = max(2,int(float(self.windowEntry.get())*self.app.samplerate))
+        except ValueError:
+            return
+        if self.rolling is None or self.rolling.values is not self.app.values or len(self.rolling.channels) != len(self.app.sensors):
+            self.rolling = RollingCorrelation(self.app.values,len(self.app.sensors))
+        centre = int(self.app.timebase.rowAt(self.app.currentTime()))
+        shown = (id(self.app.values),window,centre)
+        if shown == self.shown:
+            return
+        self.shown = shown
+        self.matrix = self.rolling.move(centre-window//2,centre-window//2+window)
+        levels = np.clip((np.nan_to_num(self.matrix)+1)*127.5,0,255).astype(np.uint8)
+        index = np.arange(self.SIZE)*len(levels)//self.SIZE# Nearest channel per pixel
+        self.image = ImageTk.PhotoImage(Image.fromarray(self.COLOURMAP[levels[index][:,index]]))
+        self.c.delete(tk.ALL)
+        self.c.create_image(0,0,image=self.image,anchor=tk.NW)
+
+    def describe(self,event):
+        """Name the channel pair under the cursor"""
+        if self.matrix is None:
+            return
+        i,j = event.y*len(self.matrix)//self.SIZE,event.x*len(self.matrix)//self.SIZE
+        if 0 <= i < len(self.matrix) and 0 <= j < len(self.matrix) and i < len(self.app.sensors) and j < len(self.app.sensors):
+            self.status.config(text="{0} / {1}: r = {2:.2f}".format(self.app.sensors[i],self.app.sensors[j],self.matrix[i,j]))
+
+    def close(self):
+        self.app.connectivityWindow = None
+        self.root.destroy()
+
+
+class RollingCorrelation():
+    """Pairwise Correlation of all Channels over a Window of Rows, Kept as Running Sums so
+        Moving the Window only Adds the Rows Entering it and Subtracts those Leaving.
+        Sums are over rows where both channels of a pair have samples"""
+    REBUILD = 50# Windows stepped through before rebuilding, bounds rounding drift
+
+    def __init__(self,values,channels):
+        self.values = values
+        self.channels = list(range(channels))
+        self.rows = (0,0)# Rows [a, b) summed
+        self.stepped = 0# Rows added or removed since the last rebuild
+
+    def rebuild(self,a,b):
+        """Sum rows a to b from scratch, centred on their channel means to keep precision"""
+        i0,x = fetchRows(self.values,a,b,self.channels)
+        with warnings.catch_warnings():# All-missing channels
+            warnings.simplefilter("ignore",category=RuntimeWarning)
+            self.offset = np.nan_to_num(np.nanmean(x,axis=0)) if len(x) else np.zeros(len(self.channels))
+        c = len(self.channels)
+        self.n,self.sx,self.sxx,self.sxy = np.zeros((c,c)),np.zeros((c,c)),np.zeros((c,c)),np.zeros((c,c))
+        self.add(x,1)
+        self.rows = (i0,i0+len(x))
+        self.stepped = 0
+
+    def add(self,x,sign):
+        """Add (sign 1) or subtract (sign -1) rows of samples"""
+        ok = np.isfinite(x)
+        m = ok.astype(np.float64)
+        xc = np.where(ok,x-self.offset,0.0)
+        self.n += sign*(m.T@m)
+        self.sx += sign*(xc.T@m)# sx[i,j] sums channel i over rows where j has a sample
+        self.sxx += sign*((xc*xc).T@m)
+        self.sxy += sign*(xc.T@xc)
+
+    def update(self,i0,i1,sign):
+        """Add or subtract rows i0 to i1, returns False if some are no longer held by the store"""
+        if i1 <= i0:
+            return True
+        first,x = fetchRows(self.values,i0,i1,self.channels)
+        if first != i0 or len(x) != i1-i0:
+            return False
+        self.add(x,sign)
+        self.stepped += i1-i0
+        return True
+
+    def move(self,a,b):
+        """Move the window to rows a to b, clipped to the recording, and get the (channels x channels) correlation"""
+        a,b = max(0,a),max(0,min(b,len(self.values)))
+        a = min(a,b)
+        a0,b0 = self.rows
+        if b <= a0 or a >= b0 or self.stepped > self.REBUILD*max(1,b-a):
+            self.rebuild(a,b)
+        elif not (self.update(b0,b,1) and self.update(b,b0,-1) and self.update(a,a0,1) and self.update(a0,a,-1)):
+            self.rebuild(a,b)# Rows left the store while stepping
+        else:
+            self.rows = (a,b)
+        return self.correlation()
+
+    def correlation(self):
+        n = np.where(self.n > 2,self.n,np.nan)
+        with np.errstate(invalid="ignore",divide="ignore"):
+            cov = self.sxy-self.sx*self.sx.T/n
+            var = self.sxx-self.sx*self.sx/n
+            return np.clip(cov/np.sqrt(var*var.T),-1,1)
+
+
 class ChannelSelector():
     """fNIRS Data Channel Selection Widget"""
     ROWS = 16# Number of Checkbuttons Per Column
+    BADGES = {"good":"\u2713","fair":"~","poor":"\u2717"}# Shapes differ as well as colours
+    GRADE_COLOURS = {"good":"#000000","fair":"#996600","poor":"#cc0000"}
 
     def __init__(self,root,app,row=0,column=0):
         """"Initialises the Channel Selector"""
@@ -495,13 +1451,22 @@ class ChannelSelector():
         self.checks = []# tk.Checkbutton instances
         self.intvars = []# tk.IntVar instances
     def loadData(self,filepath):
-        """Initialises Checkbuttons with Sensor Names"""
+        """Initialises Checkbuttons with Sensor Names, from the data already loaded by the app"""
         self.removeCheckbuttons()
-        self.tree = ET.parse(filepath)# Parse xml Tree
-        self.data = self.tree.getroot().find("data")# Find Data
-        self.sensors = [i.text for i in self.tree.getroot().find('columns')]# Get Sensor Names
+        self.sensors = self.app.sensors# Get Sensor Names
         for s in self.sensors:# Add Each Sensor as Option
             self.addOption(s)
+    def setMask(self,mask):
+        """Tick Checkbuttons to Match a Channel Mask"""
+        for var,m in zip(self.intvars,mask):
+            var.set(m)
+    def setQuality(self,channels):
+        """Badge each Checkbutton with its channel's signal quality grade, and cardiac correlation if known"""
+        for cb,name,quality in zip(self.checks,self.sensors,channels):
+            badge = self.BADGES[quality["grade"]]
+            if quality["sci"] is not None:
+                badge += " {0:.2f}".format(quality["sci"])
+            cb.config(text="{0}  {1}".format(name,badge),fg=self.GRADE_COLOURS[quality["grade"]])
     def removeCheckbuttons(self):
         """Remove all Checkbuttons"""
         for cb in self.checks:
@@ -525,6 +1490,8 @@ class ChannelSelector():
 
 class DataPlayer():
     """fNIRS Data Player Widget"""
+    PAGE_MIN_S = 2# Shortest time a page is shown for when playing faster than real time
+    SCROLL_AT = 0.25# Fraction of the width the scrubber is held at when scrolling instead
 
     def __init__(self,root,app,row=0,column=0,width=1000,height=100,sensor_ids=[0,1]):
         """Initialises data player"""
@@ -543,9 +1510,8 @@ class DataPlayer():
         # Height of each data track
         self.scaley = [-10,10]
 
-        # For Safe Threading
+        # Widgets are only touched from the Tk thread, the lock guards the scale shared with snapshots
         self.scaleLock = threading.Lock()
-        self.updateLock = threading.Lock()
 
         # Member variables associate to currently loaded xml file
         self.samplerate = 1# Device Sample Rate (Hz)
@@ -563,6 +1529,21 @@ class DataPlayer():
         # 'Peek' Scrubber Visualisation
         self.peekTime = 0
 
+        # Marker Creation
+        self.markStart = None# Pixel x where a marker drag started
+
+        # Spectrogram Mode
+        self.spectrogram = False# Show a time-frequency image instead of traces
+        self.specImage = None# Keep a reference so Tk does not discard the image
+
+    def setPlaceholder(self,text):
+        """Show a message until data is drawn"""
+        try:
+            self.c.delete("placeholder")
+            self.c.create_text(self.w//2,self.h//2,text=text,fill="#666666",tags=("placeholder"))
+        except tk.TclError:# Canvas destroyed
+            pass
+
     def clear(self):
         """Clean canvas"""
         self.c.delete(tk.ALL)
@@ -570,11 +1551,8 @@ class DataPlayer():
 
     def getScale(self):
         """Get scale"""
-        self.scaleLock.acquire()
-        scalex = self.scalex[:]
-        scaley = self.scaley[:]
-        self.scaleLock.release()
-        return (scalex,scaley)
+        with self.scaleLock:
+            return (self.scalex[:],self.scaley[:])
 
     def zoom(self,factor):
         """Zoom in/out of dataplayer"""
@@ -591,9 +1569,8 @@ class DataPlayer():
             range_ = self.measurements*2
         scalex[0] = self.progress*self.samplerate - range_/2
         scalex[1] = self.progress*self.samplerate + range_/2
-        self.setScaleX(scalex[0],scalex[1])        
+        self.setScaleX(scalex[0],scalex[1])
         self.draw()
-        self.update(self.app.videoPlayer.startTimestamp)
 
     def plot(self,x,y):
         """Transform data to pixel coordinates"""
@@ -655,83 +1632,220 @@ class DataPlayer():
     
     def update(self,startTime):
         """Get updates from the video player"""
-        if self.updateLock.locked():
-            return
-        with self.updateLock:
-            # Calculate elapsed time
-            now = time.time()
-            elapsedTime = now-startTime+self.app.dataOffset
-            if self.app.videoPlayer.state == VideoPlayer.State.PLAYING:
-                self.progress = elapsedTime
-            elif self.app.videoPlayer.state == VideoPlayer.State.PAUSED or self.app.videoPlayer.state == VideoPlayer.State.STOPPED:
-                self.progress = self.app.videoPlayer.progress+self.app.dataOffset
+        # Calculate elapsed time
+        now = self.app.videoPlayer.now()
+        elapsedTime = now-startTime+self.app.dataOffset
+        if self.app.videoPlayer.state == VideoPlayer.State.PLAYING:
+            self.progress = elapsedTime
+        elif self.app.videoPlayer.state == VideoPlayer.State.PAUSED or self.app.videoPlayer.state == VideoPlayer.State.STOPPED:
+            self.progress = self.app.videoPlayer.progress+self.app.dataOffset
 
-            scalex,_ = self.getScale()
+        scalex,_ = self.getScale()
 
-            # Move the scrubber to the right place
-            timespan = 1/self.samplerate * (scalex[1]-scalex[0])# Time represented by canvas width, in seconds
-            scalex_secs = [scalex[0]/self.samplerate,scalex[1]/self.samplerate]# Start and end of plot, in seconds
-            x = ((elapsedTime-scalex_secs[0])/(scalex_secs[1]-scalex_secs[0]))*self.w
-            self.drawScrubber()
+        # Move the scrubber to the right place
+        timespan = 1/self.samplerate * (scalex[1]-scalex[0])# Time represented by canvas width, in seconds
+        scalex_secs = [scalex[0]/self.samplerate,scalex[1]/self.samplerate]# Start and end of plot, in seconds
+        x = ((elapsedTime-scalex_secs[0])/(scalex_secs[1]-scalex_secs[0]))*self.w
+        self.drawScrubber()
 
-            self.scaleAroundX(x)
+        self.scaleAroundX(x)
 
     def scaleAroundX(self,x):
-        """Set X Scale Around Value"""
+        """Set X Scale Around Value, scrolling rather than turning pages that would show too briefly to read"""
         scalex, _ = self.getScale()
+        range_ = scalex[1]-scalex[0]
+        player = self.app.videoPlayer
+        if player.isPlaying() and player.rate > 1 and x >= 0 and range_/self.samplerate/player.rate < self.PAGE_MIN_S:
+            scalex[0] += range_*(x/self.w-self.SCROLL_AT)# Keep the scrubber at a fixed point
+            self.setScaleX(scalex[0],scalex[0]+range_)
+            self.draw()
+            self.updatePeekScrubber()
+            return
         # If out of bounds
         if x < 0:# Set canvas x range to 0
             scalex[1] -= scalex[0]
             scalex[0] = 0
             self.setScaleX(scalex[0],scalex[1])
-            self.fitYScale()
             self.draw()# Draw starting strip
         if x > self.w:# Set canvas x range to proceed
             range_ = scalex[1] - scalex[0]
             scalex[0] += range_*x/self.w
             scalex[1] += range_*x/self.w
             self.setScaleX(scalex[0],scalex[1])
-            self.fitYScale()
             self.draw()# Draw next strip
         self.updatePeekScrubber()
 
     def redraw(self):
-        """Update only the canvas - (redraws it)"""
-        self.c.update()
+        """Update only the canvas - (redraws it), without handling queued events, which would re-enter controls"""
+        self.c.update_idletasks()
 
     def seek(self,event):
         """Seek to where the user clicked"""
-        if self.app.controlLock.locked():
+        if self.app.deferIfBusy(lambda: self.seek(event)):
             return
-        self.app.controlLock.acquire()
-        x = event.x
-        scalex,_ = self.getScale()
-        scalex_secs = [scalex[0]/self.samplerate,scalex[1]/self.samplerate]# Get x scale in seconds
-        seekTo = (x/self.w) * (scalex_secs[1]-scalex_secs[0]) + scalex_secs[0]# Transform pixel coordinates to represented time
-        self.app.videoPlayer.pause()
-        self.app.videoPlayer.seek(seekTo-self.app.dataOffset)
-        self.app.videoPlayer.pause()# Restart audio to sync
-        self.update(self.app.videoPlayer.startTimestamp)
-        self.draw()
-        self.app.videoPlayer.play()
-        self.app.controlLock.release()
+        with self.app.controlLock:
+            x = event.x
+            scalex,_ = self.getScale()
+            scalex_secs = [scalex[0]/self.samplerate,scalex[1]/self.samplerate]# Get x scale in seconds
+            seekTo = (x/self.w) * (scalex_secs[1]-scalex_secs[0]) + scalex_secs[0]# Transform pixel coordinates to represented time
+            self.app.videoPlayer.pause()
+            self.app.videoPlayer.seek(seekTo-self.app.dataOffset)
+            self.app.videoPlayer.pause()# Restart audio to sync
+            self.update(self.app.videoPlayer.startTimestamp)
+            self.draw()
+            self.app.videoPlayer.play()
 
     def bindKeys(self):
         """Bind button presses on this widget to relevant behaviours"""
         self.c.bind("<Button-1>",self.seek)
         self.c.bind("<MouseWheel>",self.app.zoom)
         self.c.bind("<Button-3>",self.peek)
+        self.c.bind("<Shift-Button-3>",self.startMarker)
+        self.c.bind("<Shift-ButtonRelease-3>",self.endMarker)
+        self.c.bind("<Control-Button-3>",self.removeMarker)
+        self.c.bind("<Control-Button-1>",self.toggleSpectrogram)
+        self.c.bind("<Shift-Button-1>",self.startSelection)
+        self.c.bind("<Shift-B1-Motion>",self.dragSelection)
+        self.c.bind("<Shift-ButtonRelease-1>",self.endSelection)
+
+    def toggleSpectrogram(self,event=None):
+        """Switch between traces and a spectrogram of this dataplayer's channels, not while following a live
+            recording as the whole transform would be recomputed on every refresh"""
+        if not self.sensor_ids or isinstance(self.app.values,RingBuffer):
+            return "break"
+        self.spectrogram = not self.spectrogram
+        self.draw()
+        return "break"# Do not also seek
 
     def peek(self,event):
         x = self.horzToValue(event.x)
         self.peekTime = x
-        self.draw()
-        self.redraw()
+        self.drawPeekScrubber()
 
-    def unbind(self):
-        self.c.unbind("<Button-1>")
+    def startMarker(self,event):
+        """Start a marker, dragging before release makes an interval annotation"""
+        self.markStart = event.x
+
+    def endMarker(self,event):
+        """Add a marker or interval annotation where the user clicked or dragged"""
+        if self.markStart is None:
+            return
+        start,self.markStart = self.markStart,None
+        label = simpledialog.askstring("Marker","Label:",parent=self.root)
+        if label is None:# Cancelled
+            return
+        if abs(event.x-start) < 4:
+            self.app.addMarkers([(self.horzToValue(event.x),label)],[])
+        else:
+            self.app.addMarkers([],[(self.horzToValue(start),self.horzToValue(event.x),label)])
+
+    def startSelection(self,event):
+        """Start selecting a range, statistics update live while dragging"""
+        self.markStart = event.x
+        t = self.horzToValue(event.x)
+        self.app.select(t,t)
+        return "break"# Do not also seek
+
+    def dragSelection(self,event):
+        if self.markStart is None:
+            return
+        a,b = sorted([self.horzToValue(self.markStart),self.horzToValue(event.x)])
+        self.app.selection = [a,b]
+        self.app.drawSelection()
+
+    def endSelection(self,event):
+        """A click without dragging clears the selection"""
+        if self.markStart is not None and abs(event.x-self.markStart) < 4:
+            self.app.clearSelection()
+        self.markStart = None
+
+    def drawSelection(self):
+        """Shade the selected range and list the statistics of this dataplayer's channels over it"""
+        self.c.delete("selection")
+        if self.app.selection is None:
+            return
+        a,b = self.app.selection
+        x0,x1 = self.plot(a,0)[0],self.plot(b,0)[0]
+        self.c.create_rectangle(max(x0,0),0,min(max(x1,x0+1),self.w),self.h,fill="#3399ff",stipple="gray12",width=0,tags=("selection"))
+        for k,channel in enumerate(self.sensor_ids):
+            stats = self.app.rangeStats.get(self.app.values,channel)
+            if stats is None:
+                text = "..."# Prefix sums still building
+            else:
+                r = stats.query(self.app.timebase,a,b)
+                if r is None:
+                    continue
+                text = "mean {mean:.3g}  sd {sd:.3g}  min {min:.3g}  max {max:.3g}  slope {slope:.3g}/s  area {area:.3g}".format(**r)
+            col = self.app.getSensorCol(self.sensors[channel])
+            self.c.create_text(self.w-5,20*(k+1),text=text,fill=col,anchor=tk.NE,tags=("selection"))
+
+    def removeMarker(self,event):
+        """Remove the marker, or else the annotation, under the cursor"""
+        t = self.horzToValue(event.x)
+        tolerance = self.horzToValue(event.x+4)-t
+        i = self.app.markers.nearest(t)
+        if i is not None and abs(self.app.markers.times[i]-t) <= tolerance:
+            self.app.markers.remove(i)
+        else:
+            hits = self.app.annotations.overlapping(t,t)
+            if hits == []:
+                return
+            self.app.annotations.remove(hits[0])
+        for dp in self.app.dataPlayers:
+            dp.draw()
+        self.app.refreshEpochs()
+
+    def drawQuality(self):
+        """Shade flat-line and motion artefact regions of this dataplayer's channels, at most one per pixel.
+            Regions are sorted and disjoint, so the visible ones are found by bisecting their ends"""
+        quality = self.app.quality
+        if quality is None or not self.sensors or len(quality) != len(self.sensors):
+            return
+        a,b = self.horzToValue(0),self.horzToValue(self.w)
+        for k,channel in enumerate(self.sensor_ids):
+            for kind,fill in [("flat","#999999"),("motion","#ff9900")]:
+                lastx = None
+                regions = quality[channel][kind]
+                for i in range(bisect.bisect_left(self.app.qualityEnds[channel][kind],a),len(regions)):
+                    start,end = regions[i]
+                    if start > b:
+                        break
+                    x0,x1 = int(self.plot(start,0)[0]),int(self.plot(end,0)[0])
+                    if x1 == lastx:
+                        continue
+                    lastx = x1
+                    y = self.h-6*(k+1)# Strip per channel along the bottom
+                    self.c.create_rectangle(max(x0,0),0,min(max(x1,x0+1),self.w),self.h,fill=fill,stipple="gray12",width=0,tags=("quality"))
+                    self.c.create_rectangle(max(x0,0),y,min(max(x1,x0+1),self.w),y+5,fill=fill,width=0,tags=("quality"))
+
+    def drawMarkers(self):
+        """Draw markers and annotations in the visible range, at most one marker per pixel"""
+        a,b = self.horzToValue(0),self.horzToValue(self.w)
+        for start,end,label in self.app.annotations.overlapping(a,b):
+            x0,x1 = self.plot(start,0)[0],self.plot(end,0)[0]
+            self.c.create_rectangle(max(x0,0),0,min(x1,self.w),self.h,fill="#dddd00",stipple="gray25",width=0,tags=("marker"))
+            self.c.create_text(max(x0,0)+3,self.h-15,text=label,anchor=tk.SW,tags=("marker"))
+        times,labels = self.app.markers.between(a,b)
+        lastx = None
+        for t,label in zip(times,labels):
+            x = int(self.plot(t,0)[0])
+            if x == lastx:
+                continue
+            lastx = x
+            self.c.create_line(x,0,x,self.h,fill="#996600",dash=(3,3),tags=("marker"))
+            self.c.create_text(x+3,self.h-25,text=label,fill="#996600",anchor=tk.SW,tags=("marker"))
+
+    def unbind(self):
+        self.c.unbind("<Button-1>")
         self.c.unbind("<MouseWheel>")
         self.c.unbind("<Button-3>")
+        self.c.unbind("<Shift-Button-3>")
+        self.c.unbind("<Shift-ButtonRelease-3>")
+        self.c.unbind("<Control-Button-3>")
+        self.c.unbind("<Control-Button-1>")
+        self.c.unbind("<Shift-Button-1>")
+        self.c.unbind("<Shift-B1-Motion>")
+        self.c.unbind("<Shift-ButtonRelease-1>")
 
     def setScaleX(self,startx,endx):
         """Set x scale to list"""
@@ -756,27 +1870,20 @@ class DataPlayer():
         self.sensorMask = self.app.sensorMask
         self.measurements = self.app.measurements
 
-        # Get min and max data points
-        for sens in self.sensor_ids:
-            try:
-                for i in range(1,self.measurements):
-                    if float(self.app.data[i][sens].text) < self.sensor_range[0]:
-                        self.sensor_range[0] = float(self.app.data[i][sens].text)
-                    elif float(self.app.data[i][sens].text) > self.sensor_range[1]:
-                        self.sensor_range[1] = float(self.app.data[i][sens].text)
-            except:
-                print(self.app.data)
-        
         # Set x scale from 0 to end of track
-        self.scalex = [0,self.measurements]
+        end = self.app.timebase.timesOf(self.measurements-1,self.measurements)# Time of last row
+        self.scalex = [0,end[-1]*self.samplerate+1 if len(end) else 0]
 ##        self.scalex = [0,self.w/2]
-        # Set y scale to maximum sensor measurement
+        # Set y scale, geometry prepared on the task pool autoscales it to the visible data
         self.setScaleY(self.sensor_range[0], self.sensor_range[1])
-    def getData(self,sensor_id,t):
-        """Get data from sensor at time t"""
+    def getData(self,sensor_id,t,interpolate=True):
+        """Get data from sensor at time t, linearly interpolated between samples unless interpolate is False"""
         assert t > 0 and t < self.measurements
         try:
-            return round(float(self.app.data[int(t*self.samplerate)][sensor_id].text),3)
+            if interpolate:
+                return round(float(self.app.timebase.interpolate(self.app.values,t,[sensor_id])[0]),3)
+            i = int(self.app.timebase.rowAt(t))
+            return round(float(fetchRows(self.app.values,i,i+1,[sensor_id])[1][0,0]),3)
         except:# No data loaded, or scrubber out of bounds
             return 0
 
@@ -810,81 +1917,1518 @@ class DataPlayer():
             time_start = "-"+time_start
         self.c.create_text(15,self.h-5,text=time_start,fill="#000000",anchor=tk.SW)
 
+    def drawSpectrogram(self,geometry):
+        """Draw a prepared spectrogram image with its frequency range, one band per channel"""
+        if geometry["image"] is None:
+            self.specImage = None
+            self.c.create_text(self.w//2,self.h//2,text=geometry["message"],fill="#666666")
+        else:
+            self.specImage = ImageTk.PhotoImage(geometry["image"])
+            self.c.create_image(0,0,image=self.specImage,anchor=tk.NW)
+            fmin,fmax = geometry["freqs"]
+            band = self.h//len(self.sensor_ids)
+            for k in range(len(self.sensor_ids)):
+                self.c.create_text(self.w-5,k*band+5,text="{0:.2g}Hz".format(fmax),fill="#ffffff",anchor=tk.NE)
+                self.c.create_text(self.w-5,(k+1)*band-5,text="{0:.2g}Hz".format(fmin),fill="#ffffff",anchor=tk.SE)
+        self.drawBorder()
+        self.drawLabels()
+
     def drawLayout(self):
         """Draw the Graph Axis and Labels, with respect to fNIRS metadata and zoom"""
         self.drawBorder()
         self.drawAxes()
         self.drawLabels()
         
-    def fitYScale(self):
+    def snapshot(self):
+        """Get the state needed to prepare geometry off the Tk thread"""
         scalex,scaley = self.getScale()
-        """Adapt y-scale to whatever portion of the track is selected"""
-        if self.measurements == None:
-            return
-        try:
-            min_ = self.getData(self.sensor_ids[0],self.progress)
-        except:
-            min_ = 0
-        max_ = min_
-        for s in [0,1][0:len(self.sensor_ids)]:
-            for i in range(max(20,int(scalex[0])),min(int(scalex[1]),self.measurements)):
-                y = float(self.app.data[i][self.sensor_ids[s]].text)
-
-                if y < min_:
-                    min_ = y
-                elif y > max_:
-                    max_ = y
-        range_ = abs(max_-min_)
-        min_ = min_ - (range_*0.2)
-        max_ = max_ + (range_*0.2)
-        self.setScaleY(min_,max_)
-        
+        return {"values":self.app.values,"timebase":self.app.timebase,"sensor_ids":self.sensor_ids[:],
+                "scalex":scalex,"scaley":scaley,"w":self.w,"h":self.h,"spectrogram":self.spectrogram}
+
+    def prepare(self,snapshot):
+        """Prepare geometry from a snapshot, runs on the task pool so must not touch the canvas"""
+        if snapshot.pop("spectrogram"):
+            return prepareSpectrogram(self.app.spectrograms,onReady=self.draw,**snapshot)
+        return prepareGeometry(**snapshot)
+
     def draw(self):
-        """Draw braindata to canvas, with respect to fNIRS metadata and zoom"""
-        scalex,scaley = self.getScale()
+        """Request a redraw, the geometry is prepared on a worker and applied by the redraw scheduler"""
+        self.app.redrawScheduler.request(self)
+
+    def render(self,geometry):
+        """Apply prepared geometry to the canvas, only called from the Tk thread"""
         try:
+            self.setScaleY(geometry["scaley"][0],geometry["scaley"][1])
             self.clear()
             # Draw Graph Background
-            self.drawLayout()
-            if self.app.data == None:# If no data, break
-                return
-            # How much each pixel represents
-            if scalex[1]-scalex[0] == 0:
-                return
-            step = (scalex[1]-scalex[0])/self.w# Draw lines at pixel level resolution
-            self.fitYScale()
+            if "image" in geometry:
+                self.drawSpectrogram(geometry)
+            else:
+                self.drawLayout()
             sens_index = [0]# If one sensor displayed in this data player
             if len(self.sensor_ids) == 2:# If two sensors displayed in this data player
                 sens_index = [1,0]# Draw order blue then red to make blue line on top
+            self.drawQuality()
+            self.drawMarkers()
+            self.drawSelection()
             for s in sens_index:
-                i = scalex[0]
-                x = 0
+                if s >= len(geometry["tracks"]) or len(geometry["tracks"][s]) < 4:# Need two points for a line
+                    continue
                 trackcol = self.app.getSensorCol(self.sensors[self.sensor_ids[s]])
-                while i < scalex[1]:
-                    i += step# i Is data
-                    x += 1# x is iteration/pixel-coordinate
-                    if i<0:# Skip data for t<0
-                        continue
-                    try:
-                        # Data retrieved from xml
-                        y = float(self.app.data[int(i)][self.sensor_ids[s]].text)
-                        y2 = float(self.app.data[int(i+step)][self.sensor_ids[s]].text)
-                        # Normalize into range 0 to 1 and multiply by height
-                        y = ((y-scaley[0])/(scaley[1]-scaley[0])) * self.h
-                        y2 = ((y2-scaley[0])/(scaley[1]-scaley[0])) * self.h
-                    except IndexError:# Missing data is skipped
-                        continue
-                    self.c.create_line(x,-y+self.h,x+1,-y2+self.h,fill=trackcol,width=1)
+                self.c.create_line(*geometry["tracks"][s],fill=trackcol,width=1)
             self.drawScrubber()
             self.drawPeekScrubber()
-            self.c.update()
         except tk.TclError:# If canvas destroyed, cancel draw operation
             return
-        
 
 
-class VideoPlayer():
-    """Video Player Widget"""
+class TimelineLane(DataPlayer):
+    """Media Drawn on the Dataplayers' Timeline Rather than fNIRS Data, Subclasses Provide duration()"""
+
+    def duration(self):
+        """Length of the lane's media (s)"""
+        raise NotImplementedError
+
+    def loadData(self):
+        """Share the dataplayers' time scale, or use seconds if no fNIRS data is loaded"""
+        self.samplerate = self.app.samplerate or 1
+        self.measurements = self.app.measurements
+        players = [dp for dp in self.app.dataPlayers if not isinstance(dp,TimelineLane)]
+        if players:# Match the current zoom
+            scalex,_ = players[0].getScale()
+            self.setScaleX(scalex[0],scalex[1])
+        elif self.app.timebase is not None and self.measurements:# Span the data, as a new dataplayer will
+            end = self.app.timebase.timesOf(self.measurements-1,self.measurements)
+            self.setScaleX(0,end[-1]*self.samplerate+1 if len(end) else 0)
+        else:
+            self.setScaleX(0,(self.duration()+self.app.dataOffset)*self.samplerate+1)
+
+    def snapshot(self):
+        scalex,_ = self.getScale()
+        return {"scalex":scalex,"samplerate":self.samplerate,"offset":self.app.dataOffset,"w":self.w,"h":self.h}
+
+
+class AudioLane(TimelineLane):
+    """Waveform of the Session Audio, Drawn from its Envelope Pyramid on the Dataplayers' Timeline"""
+    ROW = 999# Grid row, below every dataplayer
+
+    def __init__(self,root,app,envelope,width=1000,height=60):
+        DataPlayer.__init__(self,root,app,row=self.ROW,column=0,width=width,height=height,sensor_ids=[])
+        self.envelope = envelope
+        self.scaley = [-1,1]
+
+    def duration(self):
+        return self.envelope.duration()
+
+    def drawLabels(self):
+        self.c.create_text(30,20,text="Audio",fill="#666666",anchor=tk.NW)
+
+    def prepare(self,snapshot):
+        """Outline polygons of the min/max and RMS envelopes, at most one bin per pixel"""
+        scalex,samplerate,offset,w,h = [snapshot[k] for k in ["scalex","samplerate","offset","w","h"]]
+        t0,t1 = scalex[0]/samplerate-offset,scalex[1]/samplerate-offset# Audio time, s
+        times,mins,maxs,rms = self.envelope.query(t0,t1,w)
+        if len(times) < 2:
+            return {"scaley":[-1,1],"tracks":[]}
+        x = ((times-t0)/(t1-t0)*w).tolist()
+        scale = h/2/(self.envelope.peak or 1)
+        def outline(upper,lower):
+            top = np.column_stack([x,h/2-upper*scale]).ravel().tolist()
+            bottom = np.column_stack([x[::-1],h/2-lower[::-1]*scale]).ravel().tolist()
+            return top+bottom
+        return {"scaley":[-1,1],"tracks":[outline(maxs,mins),outline(rms,-rms)]}
+
+    def render(self,geometry):
+        """Apply prepared outlines to the canvas, only called from the Tk thread"""
+        try:
+            self.clear()
+            self.drawBorder()
+            self.drawLabels()
+            self.drawMarkers()
+            for coords,fill in zip(geometry["tracks"],["#aaaaaa","#555555"]):
+                self.c.create_polygon(*coords,fill=fill,outline="")
+            self.drawScrubber()
+            self.drawPeekScrubber()
+        except tk.TclError:# If canvas destroyed, cancel draw operation
+            return
+
+
+class FilmstripLane(TimelineLane):
+    """Video Thumbnails Evenly Spaced on the Dataplayers' Timeline, Denser Ones Fill in on Zooming"""
+    ROW = 1# Grid row, between the video and the dataplayers
+    HEIGHT = 48
+    MIN_SPACING = 1# Closest thumbnail spacing (s), keyframes are rarely denser
+
+    def __init__(self,root,app,thumbnails,duration,width=1000):
+        DataPlayer.__init__(self,root,app,row=self.ROW,column=0,width=width,height=self.HEIGHT,sensor_ids=[])
+        self.c.config(bg="#000000")
+        self.thumbnails = thumbnails
+        self.length = duration# Length of the video (s)
+        self.strip = None# Keep a reference so Tk does not discard the image
+
+    def duration(self):
+        return self.length
+
+    def drawLabels(self):
+        pass
+
+    def prepare(self,snapshot):
+        """Compose the strip from the nearest cached thumbnail to each slot, requesting any missing ones"""
+        scalex,samplerate,offset,w,h = [snapshot[k] for k in ["scalex","samplerate","offset","w","h"]]
+        t0,t1 = scalex[0]/samplerate-offset,scalex[1]/samplerate-offset# Video time, s
+        thumbW = self.thumbnails.w
+        # Power of two spacing, so each zoom level's thumbnails include those of coarser levels
+        spacing = 2**np.ceil(np.log2(max((t1-t0)/max(1,w//thumbW),self.MIN_SPACING)))
+        times = np.arange(max(0,np.ceil(t0/spacing)),np.floor(min(t1,self.length)/spacing)+1)*spacing
+        times = times[times < self.length]
+        self.thumbnails.request([int(round(t*1000)) for t in times])
+        strip = Image.new("RGB",(w,h))
+        shown = set()
+        for t in times:# Thumbnails are placed at their keyframe's time, which slots near it share
+            found = self.thumbnails.nearest(int(round(t*1000)))
+            if found is not None and found[0] not in shown:
+                ms,image = found
+                shown.add(ms)
+                strip.paste(image,(int((ms/1000-t0)/(t1-t0)*w)-thumbW//2,0))
+        return {"scaley":[-1,1],"tracks":[],"image":strip}
+
+    def render(self,geometry):
+        """Apply the prepared strip to the canvas, only called from the Tk thread"""
+        try:
+            self.clear()
+            self.strip = ImageTk.PhotoImage(geometry["image"])
+            self.c.create_image(0,0,image=self.strip,anchor=tk.NW)
+            self.drawMarkers()
+            self.drawScrubber()
+            self.drawPeekScrubber()
+        except tk.TclError:# If canvas destroyed, cancel draw operation
+            return
+
+
+class ThumbnailCache():
+    """Keyframe Thumbnails of one Video, Extracted by Several ffmpeg Processes in the Background
+        and Kept on Disk, so each is Decoded Once per Video. Newest Requests are Extracted First.
+        Requested times are snapped to the nearest keyframe, and thumbnails are kept at their keyframe's time"""
+    VERSION = 2# Bump when extraction changes, invalidates cached thumbnails
+    DIRECTORY = "thumb_cache"
+    WORKERS = max(1,(os.cpu_count() or 2)//2)# Concurrent ffmpeg processes, the rest of the machine plays video
+    MAX_PENDING = 256# Older requests are dropped beyond this, they are for views scrolled past
+    MAX_LOADED = 2048# Thumbnails kept decoded in memory
+
+    def __init__(self,path,w,h,fps):
+        self.directory = os.path.join(self.DIRECTORY,cacheKey(path,"{0}x{1}".format(w,h),self.VERSION))
+        os.makedirs(self.directory,exist_ok=True)
+        self.path,self.w,self.h,self.fps = path,w,h,fps
+        self.onReady = None# Called from a worker thread when a thumbnail is added
+        self.available = sorted(int(name[:-4]) for name in os.listdir(self.directory) if re.match(r"\d+\.jpg$",name))
+        self.loaded = collections.OrderedDict()# Keyframe ms -> PIL image
+        self.pending = []# Requested times (ms), newest last
+        self.keyframes = None# Keyframe times (ms), ascending, probed before the first extraction
+        self.snapped = set()# Requested times already snapped to an extracted keyframe
+        self.failed = set()# Requested times whose keyframe could not be extracted
+        self.extracting = set()# Keyframe times (ms) being extracted by a worker
+        self.closed = False
+        self.condition = threading.Condition()
+        threading.Thread(target=self.probe,daemon=True).start()
+        for _ in range(self.WORKERS):
+            threading.Thread(target=self.work,daemon=True).start()
+
+    def probe(self):
+        """Find the video's keyframes, if they cannot be probed every requested time is extracted as it is"""
+        frames = probeKeyframes(self.path,self.fps)
+        with self.condition:
+            self.keyframes = [] if frames is None else np.unique(np.round(frames/self.fps*1000).astype(int)).tolist()
+            self.condition.notify_all()
+
+    def keyframeAt(self,ms):
+        """Time (ms) of the keyframe nearest ms, called with the condition held"""
+        if not self.keyframes:
+            return ms
+        i = bisect.bisect_left(self.keyframes,ms)
+        return min(self.keyframes[max(0,i-1):i+1],key=lambda k: abs(k-ms))
+
+    def request(self,times):
+        """Queue extraction of thumbnails at times (ms) not already cached, ahead of earlier requests"""
+        with self.condition:
+            done = self.snapped|self.failed
+            new = [ms for ms in times if ms not in done and ms not in self.pending]
+            if not new:
+                return
+            self.pending = [ms for ms in self.pending if ms not in new]+new[::-1]# Leftmost extracted first
+            del self.pending[:-self.MAX_PENDING]
+            self.condition.notify_all()
+
+    def nearest(self,ms):
+        """Get the (keyframe ms, image) of the cached thumbnail closest to ms, or None if there are none yet"""
+        with self.condition:
+            if not self.available:
+                return None
+            i = bisect.bisect_left(self.available,ms)
+            ms = min(self.available[max(0,i-1):i+1],key=lambda a: abs(a-ms))
+            image = self.loaded.get(ms)
+            if image is not None:
+                self.loaded.move_to_end(ms)
+                return image
+        image = Image.open(os.path.join(self.directory,"{0}.jpg".format(ms)))
+        image.load()
+        with self.condition:
+            self.loaded[ms] = image
+            if len(self.loaded) > self.MAX_LOADED:
+                self.loaded.popitem(last=False)
+        return ms,image
+
+    def work(self):
+        """Worker loop, each extraction runs in its own ffmpeg process decoding only keyframes.
+            ffmpeg outputs the first keyframe at or after the seek, so it seeks half a frame before the keyframe"""
+        while True:
+            with self.condition:
+                while (not self.pending or self.keyframes is None) and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                requested = self.pending.pop()
+                ms = self.keyframeAt(requested)
+                if ms in self.available or ms in self.extracting:# Another request snapped to the same keyframe
+                    self.snapped.add(requested)
+                    continue
+                self.extracting.add(ms)
+            part = os.path.join(self.directory,"part_{0}.jpg".format(ms))
+            command = "ffmpeg -y -loglevel error -skip_frame nokey -ss {0:.4f} -i \"{1}\" -frames:v 1 -vf scale={2}:{3} \"{4}\"".format(
+                max(0,ms/1000-0.5/self.fps),self.path,self.w,self.h,part)
+            run(command,stdout=DEVNULL,stderr=DEVNULL,shell=True)
+            with self.condition:
+                self.extracting.discard(ms)
+                if os.path.isfile(part):
+                    os.replace(part,os.path.join(self.directory,"{0}.jpg".format(ms)))
+                    bisect.insort(self.available,ms)
+                    self.snapped.add(requested)
+                else:
+                    self.failed.add(requested)
+                    continue
+            if self.onReady is not None:
+                self.onReady()
+
+    def close(self):
+        """Stop extracting, thumbnails already on disk are kept"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class AudioEnvelope():
+    """Min/Max/RMS Envelope Pyramid of an Audio Track, Level k Bins BIN*2**k Samples,
+        so a Waveform Renders at any Zoom from about one Bin per Pixel without the Raw Samples"""
+    RATE = 8000# Mono PCM rate the audio is decoded at (Hz)
+    BIN = 32# Samples per finest bin (4ms)
+    PCM_ARGS = "-vn -ac 1 -ar {0} -f f32le pipe:1".format(RATE)# ffmpeg output writing the PCM to stdout
+
+    def __init__(self,levels):
+        self.levels = levels# [(mins, maxs, rms)] finest first
+        self.peak = max(float(np.max(np.abs(levels[-1][0]),initial=0)),float(np.max(np.abs(levels[-1][1]),initial=0)))
+
+    @classmethod
+    def fromPCM(cls,stream,chunkBytes=2**20):
+        """Reduce float32 PCM read from a binary stream to the pyramid, one chunk at a time"""
+        mins,maxs,sumsq = [],[],[]
+        carry = b""
+        while True:
+            chunk = stream.read(chunkBytes)
+            if not chunk and not carry:
+                break
+            data = carry+chunk
+            usable = len(data)//(cls.BIN*4)*cls.BIN*4 if chunk else len(data)//4*4
+            carry = data[usable:] if chunk else b""
+            samples = np.frombuffer(data[:usable],dtype=np.float32)
+            if not chunk and len(samples)%cls.BIN:# Pad the final partial bin with silence
+                samples = np.concatenate([samples,np.zeros(cls.BIN-len(samples)%cls.BIN,dtype=np.float32)])
+            bins = samples.reshape(-1,cls.BIN)
+            mins.append(bins.min(axis=1))
+            maxs.append(bins.max(axis=1))
+            sumsq.append(np.square(bins,dtype=np.float64).mean(axis=1))
+            if not chunk:
+                break
+        if not mins or not sum(len(m) for m in mins):
+            return None
+        levels = [(np.concatenate(mins),np.concatenate(maxs),np.sqrt(np.concatenate(sumsq)))]
+        while len(levels[-1][0]) > 1:
+            lo,hi,rms = levels[-1]
+            n = len(lo)//2*2
+            level = [np.minimum(lo[:n:2],lo[1:n:2]),np.maximum(hi[:n:2],hi[1:n:2]),np.sqrt((rms[:n:2]**2+rms[1:n:2]**2)/2)]
+            if n < len(lo):# Odd bin carried up alone
+                level = [np.append(level[0],lo[-1]),np.append(level[1],hi[-1]),np.append(level[2],rms[-1])]
+            levels.append(tuple(level))
+        return cls(levels)
+
+    @classmethod
+    def build(cls,path):
+        """Decode an audio or video file to PCM with ffmpeg and reduce it"""
+        command = "ffmpeg -i \"{0}\" -loglevel error {1}".format(path,cls.PCM_ARGS)
+        process = Popen(command,stdout=PIPE,stderr=DEVNULL,shell=True)
+        try:
+            return cls.fromPCM(process.stdout)
+        finally:
+            process.stdout.close()
+            process.wait()
+
+    def save(self,path):
+        arrays = {}
+        for k,(lo,hi,rms) in enumerate(self.levels):
+            arrays["min{0}".format(k)],arrays["max{0}".format(k)],arrays["rms{0}".format(k)] = lo,hi,rms
+        np.savez(path,**arrays)
+
+    @classmethod
+    def load(cls,path):
+        with np.load(path) as arrays:
+            return cls([(arrays["min{0}".format(k)],arrays["max{0}".format(k)],arrays["rms{0}".format(k)])
+                        for k in range(len(arrays.files)//3)])
+
+    def duration(self):
+        """Length of the audio (s)"""
+        return len(self.levels[0][0])*self.BIN/self.RATE
+
+    def query(self,t0,t1,w):
+        """Get bin start times (s), mins, maxs and RMS between t0 and t1 (s), at most w bins,
+            from the coarsest level still at least as fine as one pixel"""
+        if t1 <= t0 or w < 1:
+            return np.empty(0),np.empty(0),np.empty(0),np.empty(0)
+        k = int(np.clip(np.floor(np.log2(max((t1-t0)/w*self.RATE/self.BIN,1))),0,len(self.levels)-1))
+        binSeconds = self.BIN*2**k/self.RATE
+        lo,hi,rms = self.levels[k]
+        i0,i1 = max(0,int(t0/binSeconds)),min(len(lo),int(np.ceil(t1/binSeconds))+1)
+        if i1 <= i0:
+            return np.empty(0),np.empty(0),np.empty(0),np.empty(0)
+        times,lo,hi,rms = np.arange(i0,i1)*binSeconds,lo[i0:i1],hi[i0:i1],rms[i0:i1]
+        if len(lo) > w:# Merge into w columns
+            starts = np.linspace(0,len(lo),w+1).astype(int)[:-1]
+            counts = np.diff(np.append(starts,len(lo)))
+            times,lo,hi = times[starts],np.minimum.reduceat(lo,starts),np.maximum.reduceat(hi,starts)
+            rms = np.sqrt(np.add.reduceat(rms**2,starts)/counts)
+        return times,lo,hi,rms
+
+
+def decimate(x,y,w,ymax=None):
+    """Reduce a track, or a min (y) and max (ymax) envelope, to at most two points per pixel column"""
+    cols = np.clip(x,0,w-1).astype(int)
+    starts = np.flatnonzero(np.r_[True,np.diff(cols) != 0])
+    mins = np.fmin.reduceat(y,starts)# fmin/fmax ignore missing (NaN) readings
+    maxs = np.fmax.reduceat(y if ymax is None else ymax,starts)
+    return np.repeat(cols[starts],2).astype(float),np.column_stack((mins,maxs)).ravel()
+
+def fetchRows(values,i0,i1,cols):
+    """Get rows i0 to i1 of the given columns from an array or sample store,
+        returns the first row actually available and the rows"""
+    if isinstance(values,np.ndarray):
+        return max(0,i0),values[max(0,i0):i1,cols]
+    return values.fetch(i0,i1,cols)
+
+class Timebase():
+    """Maps Time (s) to Rows, Uniform Recordings use an O(1) Fast Path, Irregular ones a Binary Search"""
+
+    def __init__(self,samplerate,timestamps=None,normalised=False):
+        """Timestamps are only kept if they drift from the nominal sample rate by half a sample or more,
+            normalised timestamps have already been checked and made relative to the first row"""
+        self.samplerate = samplerate
+        self.timestamps = timestamps if normalised else None
+        if not normalised and timestamps is not None and len(timestamps) and np.all(np.isfinite(timestamps)):
+            timestamps = timestamps-timestamps[0]# Recording starts at t=0
+            if np.max(np.abs(timestamps-np.arange(len(timestamps))/samplerate)) >= 0.5/samplerate:
+                self.timestamps = timestamps
+
+    def isUniform(self):
+        return self.timestamps is None
+
+    def rowAt(self,t):
+        """Get the last row at or before time t, vectorised over arrays of t"""
+        if self.timestamps is None:
+            return np.floor(np.asarray(t)*self.samplerate).astype(int)
+        return np.searchsorted(self.timestamps,t,side="right")-1
+
+    def rowRange(self,t0,t1):
+        """Get rows from the last at or before t0 to the first after t1, so lines reach the edges"""
+        return int(self.rowAt(t0)),int(self.rowAt(t1))+2
+
+    def timesOf(self,i0,i1):
+        """Get the times (s) of rows i0 to i1"""
+        if self.timestamps is None:
+            return np.arange(i0,i1)/self.samplerate
+        return self.timestamps[max(0,i0):i1]
+
+    def timesAt(self,rows):
+        """Get the times (s) of an array of rows"""
+        if self.timestamps is None:
+            return np.asarray(rows)/self.samplerate
+        return self.timestamps[np.clip(rows,0,len(self.timestamps)-1)]
+
+    def interpolate(self,values,t,cols):
+        """Linearly interpolate columns at time t, raises IndexError outside the recording"""
+        i = int(self.rowAt(t))
+        first,rows = fetchRows(values,i,i+2,cols)
+        if first != i or len(rows) == 0:
+            raise IndexError("Time {0}s is outside the recording".format(t))
+        if len(rows) == 1:# Last sample
+            return rows[0]
+        t0,t1 = self.timesOf(i,i+2)
+        frac = (t-t0)/(t1-t0) if t1 > t0 else 0
+        return rows[0]+(rows[1]-rows[0])*frac
+
+
+def prepareGeometry(values,timebase,sensor_ids,scalex,scaley,w,h):
+    """Decimate and autoscale the visible part of each track, safe to run off the Tk thread"""
+    geometry = {"scaley":scaley,"tracks":[]}
+    if values is None or scalex[1]-scalex[0] == 0:
+        return geometry
+    i0,i1 = timebase.rowRange(scalex[0]/timebase.samplerate,scalex[1]/timebase.samplerate)
+    i0 = max(0,i0)
+    i1 = min(len(values),i1)
+    if i1 <= i0:
+        return geometry
+    blockRows = getattr(values,"blockRows",None)
+    if blockRows and i1-i0 >= w*blockRows:# Blocks are narrower than pixels, draw from block summaries
+        rows,lo,hi = values.summarise(i0,i1,sensor_ids)
+        times = timebase.timesAt(rows)
+        skip = 0
+    else:
+        i0,lo = fetchRows(values,i0,i1,sensor_ids)
+        hi = lo
+        i1 = i0+len(lo)
+        times = timebase.timesOf(i0,i1)
+        skip = max(20,i0)-i0# Skip settling samples at the start
+    # Adapt y-scale to whatever portion of the track is selected
+    fit = np.concatenate((lo[skip:],hi[skip:]))
+    fit = fit[np.isfinite(fit)]
+    if fit.size:
+        min_,max_ = fit.min(),fit.max()
+        range_ = abs(max_-min_)
+        scaley = [float(min_-range_*0.2),float(max_+range_*0.2)]
+        if scaley[0] == scaley[1]:# Prevent /0 errors when scaling
+            scaley[1] += 0.1
+        geometry["scaley"] = scaley
+    # Transform data to pixel coordinates, rows are placed by their time so irregular sampling stays aligned
+    x = (times*timebase.samplerate-scalex[0])/(scalex[1]-scalex[0])*w
+    for s in range(len(sensor_ids)):
+        xs,ys = x,lo[:,s]
+        if len(x) > 2*w or hi is not lo:# More samples than pixels, draw an envelope instead
+            xs,ys = decimate(xs,ys,w,hi[:,s])
+        ys = h-(ys-scaley[0])/(scaley[1]-scaley[0])*h
+        keep = np.isfinite(ys)# Missing data is skipped
+        geometry["tracks"].append(np.column_stack((xs[keep],ys[keep])).ravel().tolist())
+    return geometry
+
+
+def prepareSpectrogram(spectrograms,values,timebase,sensor_ids,scalex,scaley,w,h,onReady):
+    """Resample the cached spectrogram of each channel to the visible range, stacked one band per channel,
+        or a message while any is still being computed, after which onReady is called. Safe to run off the Tk thread"""
+    if values is None:# Nothing loaded yet
+        return {"scaley":scaley,"tracks":[]}
+    t0,t1 = scalex[0]/timebase.samplerate,scalex[1]/timebase.samplerate
+    computed = [spectrograms.get(values,timebase,channel,onReady) for channel in sensor_ids]# Start every channel
+    for spectrogram,message in [(SpectrogramCache.PENDING,"Computing Spectrogram..."),
+                                (SpectrogramCache.FAILED,"Error Computing Spectrogram"),
+                                (None,"Recording Too Short for a Spectrogram")]:
+        if any(s is spectrogram for s in computed):
+            return {"scaley":scaley,"tracks":[],"image":None,"message":message}
+    bands,freqs = [],None
+    for k,spectrogram in enumerate(computed):
+        band = h//len(sensor_ids) if k < len(sensor_ids)-1 else h-h//len(sensor_ids)*k
+        bands.append(spectrogram.render(t0,t1,w,band))
+        freqs = (spectrogram.freqs[0],spectrogram.freqs[-1])
+    return {"scaley":scaley,"tracks":[],"image":Image.fromarray(np.vstack(bands)),"freqs":freqs}
+
+
+class Spectrogram():
+    """Short-Time Fourier Transform of one Channel, Stored as Colour-Mapped Tiles of TILE Frames
+        so Zooming and Scrolling only Resample Existing Pixels"""
+    WINDOW_S = 30# Window length (s), long enough to resolve Mayer waves (~0.1Hz)
+    HOPS = 8# Windows overlap so a new frame starts every WINDOW_S/HOPS
+    FMAX = 2.0# Highest frequency shown (Hz), above cardiac (~1Hz)
+    TILE = 256# Frames per tile
+    BATCH = 4096# Frames transformed at once, bounds memory on long recordings
+    # Viridis, perceptually uniform and colourblind friendly
+    COLOURMAP = np.array([np.interp(np.linspace(0,1,256),np.linspace(0,1,5),c) for c in
+                          zip((68,1,84),(59,82,139),(33,145,140),(94,201,98),(253,231,37))]).T.astype(np.uint8)
+
+    def __init__(self,start,step,count,freqs,tiles):
+        self.start = start# Centre of the first frame (s)
+        self.step = step# Time between frames (s)
+        self.count = count# Number of frames
+        self.freqs = freqs# Frequency of each row, ascending (Hz)
+        self.tiles = tiles# (rows x TILE x 3) images, highest frequency first
+
+    @classmethod
+    def compute(cls,values,timebase,channel,window=WINDOW_S,fmax=FMAX):
+        """Spectrogram of a channel, or None if the recording is shorter than one window or has no readings.
+            Samples are read BATCH frames at a time, so memory stays flat for out-of-core stores"""
+        samplerate = timebase.samplerate
+        first,n = fetchRows(values,0,1,[channel])[0],len(values)
+        if n <= first:
+            return None
+        start = float(timebase.timesAt(first))
+        # Irregular recordings are resampled onto the nominal sample grid from the first row
+        count = n-first if timebase.isUniform() else int(np.ceil((float(timebase.timesAt(n-1))-start)*samplerate))
+        nperseg = max(4,int(round(window*samplerate)))
+        if count < nperseg:
+            return None
+        hop = max(1,nperseg//cls.HOPS)
+        nframes = (count-nperseg)//hop+1
+        freqs = np.fft.rfftfreq(nperseg,1/samplerate)
+        keep = (freqs > 0)&(freqs <= fmax)
+        if keep.sum() < 2:
+            keep[1:3] = True
+        taper = np.hanning(nperseg)
+        power = np.empty((nframes,int(keep.sum())),dtype=np.float32)
+        readings = False
+        for f0 in range(0,nframes,cls.BATCH):
+            f1 = min(nframes,f0+cls.BATCH)
+            x = cls.samples(values,timebase,channel,first,start,f0*hop,(f1-1)*hop+nperseg)
+            finite = np.isfinite(x)
+            if finite.any():
+                readings = True
+                x[~finite] = np.interp(np.flatnonzero(~finite),np.flatnonzero(finite),x[finite])# Fill missing readings
+            else:
+                x[:] = 0
+            batch = np.lib.stride_tricks.sliding_window_view(x,nperseg)[::hop]
+            batch = (batch-batch.mean(axis=1,keepdims=True))*taper# Remove each window's baseline
+            power[f0:f1] = 10*np.log10(np.abs(np.fft.rfft(batch,axis=1)[:,keep])**2+1e-12)
+        if not readings:
+            return None
+        lo,hi = np.percentile(power,[5,99.5])
+        levels = np.clip((power-lo)/((hi-lo) or 1)*255,0,255).astype(np.uint8)
+        tiles = [cls.COLOURMAP[levels[i:i+cls.TILE].T[::-1]] for i in range(0,len(levels),cls.TILE)]
+        return cls(start+(nperseg-1)/2/samplerate,hop/samplerate,nframes,freqs[keep],tiles)
+
+    @staticmethod
+    def samples(values,timebase,channel,first,start,j0,j1):
+        """Samples j0 to j1 of a channel from row first, resampled onto the nominal grid from start (s)
+            if the recording is irregular"""
+        if timebase.isUniform():
+            return np.array(fetchRows(values,first+j0,first+j1,[channel])[1][:,0],dtype=np.float64)
+        grid = start+np.arange(j0,j1)/timebase.samplerate
+        r0,r1 = timebase.rowAt(grid[[0,-1]])
+        i0,x = fetchRows(values,max(first,int(r0)),int(r1)+2,[channel])# Rows either side of the grid
+        x = np.asarray(x[:,0],dtype=np.float64)
+        times = timebase.timesOf(i0,i0+len(x))
+        finite = np.isfinite(x)
+        if not finite.any():
+            return np.full(len(grid),np.nan)
+        return np.interp(grid,times[finite],x[finite])
+
+    def render(self,t0,t1,w,h):
+        """Resample the frames between t0 and t1 (s) to a (h x w x 3) image, nearest frame per pixel"""
+        image = np.full((h,w,3),255,dtype=np.uint8)
+        if h < 1 or w < 1:
+            return image
+        index = np.rint((t0+(np.arange(w)+0.5)*(t1-t0)/w-self.start)/self.step).astype(int)
+        inside = (index >= 0)&(index < self.count)
+        if not inside.any():
+            return image
+        index = index[inside]
+        k0,k1 = index.min()//self.TILE,index.max()//self.TILE+1
+        strip = np.concatenate(self.tiles[k0:k1],axis=1)
+        rows = np.arange(h)*len(self.freqs)//h
+        image[:,inside] = strip[rows][:,index-k0*self.TILE]
+        return image
+
+
+class SpectrogramCache():
+    """Spectrograms by Data, Channel and Parameters, each Computed Once in its own Keyed Task,
+        so Redraws never Wait on a Transform"""
+    ENTRIES = 64# Channels kept
+    PENDING = object()# Still being computed
+    FAILED = object()# Computing raised an error, not retried until the data changes
+
+    def __init__(self,tasks):
+        self.tasks = tasks
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()# key -> Spectrogram, None if too short, or FAILED, oldest first
+        self.waiting = {}# key -> callbacks to run once the spectrogram is computed
+
+    def get(self,values,timebase,channel,onReady,window=Spectrogram.WINDOW_S,fmax=Spectrogram.FMAX):
+        """Get a spectrogram, or PENDING after starting its transform if no request already has,
+            then onReady is called on the Tk thread once it is done. Safe to call from any thread"""
+        key = (id(values),len(values),channel,window,fmax,timebase.samplerate)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            start = key not in self.waiting
+            callbacks = self.waiting.setdefault(key,[])
+            if onReady not in callbacks:
+                callbacks.append(onReady)
+        if start:
+            self.tasks.run(Spectrogram.compute,values,timebase,channel,window,fmax,key=("spectrogram",)+key,
+                           onDone=lambda spectrogram: self.done(key,spectrogram),onError=lambda e: self.failed(key,e))
+        return self.PENDING
+
+    def done(self,key,spectrogram):
+        """Store a computed spectrogram and notify its requests, on the Tk thread"""
+        with self.lock:
+            callbacks = self.waiting.pop(key,None)
+            if callbacks is None:# Cleared since it started
+                return
+            self.entries[key] = spectrogram
+            if len(self.entries) > self.ENTRIES:
+                self.entries.popitem(last=False)
+        for callback in callbacks:
+            callback()
+
+    def failed(self,key,e):
+        print("Error Computing Spectrogram:",e)
+        self.done(key,self.FAILED)
+
+    def clear(self):
+        """Forget every spectrogram, transforms still running are cancelled, on the Tk thread"""
+        with self.lock:
+            keys = list(self.waiting)
+            self.entries.clear()
+            self.waiting.clear()
+        for key in keys:
+            self.tasks.cancel(("spectrogram",)+key)
+
+
+def findRuns(mask):
+    """Start and end (exclusive) indices of each run of True in a boolean array"""
+    edges = np.flatnonzero(np.diff(np.concatenate([[0],mask.astype(np.int8),[0]])))
+    return edges[0::2],edges[1::2]
+
+
+class QualityScan():
+    """Whole-Recording Signal Quality per Channel, Scanned in Chunks of Rows so Memory Stays Flat:
+        cardiac correlation of O2Hb/HHb pairs (scalp coupling), flat-line or saturated runs,
+        and motion artefact spikes in a sliding-window derivative"""
+    VERSION = 1# Bump when metrics change, invalidates cached scans
+    DIRECTORY = "quality_cache"
+    WINDOW_S = 10# Cardiac correlation window (s)
+    CARDIAC = (0.5,2.5)# Cardiac band (Hz)
+    FLAT_S = 2# Shortest flat-line run reported (s)
+    MOTION_S = 1# Derivative span for motion spikes (s)
+    MOTION_K = 8# Spike threshold, in median absolute derivatives
+    CHUNK_WINDOWS = 256# Correlation windows of rows scanned at once
+    POOR = (0.5,0.2)# Below this cardiac correlation, or above this fraction flat or moving, a channel is poor
+    FAIR = (0.75,0.05)
+
+    @classmethod
+    def cached(cls,path,values,timebase,sensors):
+        """Scan a recording file, or load its previous scan"""
+        cache = os.path.join(cls.DIRECTORY,cacheKey(path,cls.VERSION)+".json")
+        if os.path.isfile(cache):
+            with open(cache) as file:
+                return json.load(file)
+        channels = cls.scan(values,timebase,sensors)
+        os.makedirs(cls.DIRECTORY,exist_ok=True)
+        with open(cache+".part","w") as file:
+            json.dump(channels,file)
+        os.replace(cache+".part",cache)
+        return channels
+
+    @classmethod
+    def scan(cls,values,timebase,sensors):
+        """Get {"sci", "flat", "motion", "grade"} for each channel, regions are [start, end] times (s)"""
+        samplerate,n,cols = timebase.samplerate,len(values),list(range(len(sensors)))
+        L = max(4,int(round(cls.WINDOW_S*samplerate)))
+        k = max(1,int(round(cls.MOTION_S*samplerate)))
+        match_oxy,match_deoxy = re.compile(MATCH_OXY),re.compile(MATCH_DEOXY)
+        pairs = [(i,i+1) for i in range(len(sensors)-1)
+                 if match_oxy.match(sensors[i] or "") and match_deoxy.match(sensors[i+1] or "")]
+        freqs = np.fft.rfftfreq(L,1/samplerate)
+        band = (freqs >= cls.CARDIAC[0])&(freqs <= cls.CARDIAC[1])
+        correlations = [[] for _ in pairs]
+        flat = [[] for _ in cols]# Row runs, merged across chunks
+        motion = [[] for _ in cols]
+        def extend(runs,starts,ends,gap=0):
+            for start,end in zip(starts.tolist(),ends.tolist()):
+                if runs and start <= runs[-1][1]+gap:
+                    runs[-1][1] = max(runs[-1][1],end)
+                else:
+                    runs.append([start,end])
+        for i0 in range(0,n,L*cls.CHUNK_WINDOWS):
+            i1 = min(n,i0+L*cls.CHUNK_WINDOWS)
+            first,rows = fetchRows(values,max(0,i0-k),i1,cols)# Earlier rows give the derivative context
+            rows = np.asarray(rows,dtype=np.float64)
+            # Flat or saturated: unchanged from the previous row, or missing
+            unchanged = np.zeros(rows.shape,dtype=bool)
+            unchanged[1:] = rows[1:] == rows[:-1]
+            unchanged |= np.isnan(rows)
+            # Motion: change over MOTION_S far above this chunk's typical change
+            change = np.full(rows.shape,np.nan)
+            change[k:] = np.abs(rows[k:]-rows[:-k])
+            with np.errstate(all="ignore"),warnings.catch_warnings():# Channels missing throughout the chunk
+                warnings.simplefilter("ignore",category=RuntimeWarning)
+                threshold = cls.MOTION_K*np.nanmedian(change,axis=0)
+                spikes = (change > threshold)&(threshold > 0)
+            skip = i0-first# Context rows already scanned by the previous chunk
+            for c in cols:
+                starts,ends = findRuns(unchanged[skip:,c])
+                extend(flat[c],starts+i0,ends+i0)
+                starts,ends = findRuns(spikes[skip:,c])
+                extend(motion[c],starts+i0,ends+i0,gap=k)
+            # Cardiac correlation over whole windows, band-passed in the frequency domain
+            if pairs and band.any() and (i1-i0)//L:
+                windows = rows[skip:skip+(i1-i0)//L*L].reshape(-1,L,len(cols))
+                with np.errstate(all="ignore"),warnings.catch_warnings():# Windows missing throughout
+                    warnings.simplefilter("ignore",category=RuntimeWarning)
+                    windows = windows-np.nanmean(windows,axis=1,keepdims=True)
+                windows = np.nan_to_num(windows)
+                spectrum = np.fft.rfft(windows,axis=1)
+                spectrum[:,~band] = 0
+                filtered = np.fft.irfft(spectrum,n=L,axis=1)
+                for p,(oxy,deoxy) in enumerate(pairs):
+                    a,b = filtered[:,:,oxy],filtered[:,:,deoxy]
+                    with np.errstate(all="ignore"):
+                        r = np.sum(a*b,axis=1)/np.sqrt(np.sum(a*a,axis=1)*np.sum(b*b,axis=1))
+                    correlations[p].append(np.abs(r[np.isfinite(r)]))
+        sci = [None]*len(cols)
+        for p,(oxy,deoxy) in enumerate(pairs):
+            r = np.concatenate(correlations[p]) if correlations[p] else np.empty(0)
+            if r.size:
+                sci[oxy] = sci[deoxy] = float(np.median(r))
+        flatRows = max(1,int(round(cls.FLAT_S*samplerate)))
+        channels = []
+        for c in cols:
+            runs = [run for run in flat[c] if run[1]-run[0] >= flatRows]
+            fractions = [sum(e-s for s,e in runs)/max(1,n),sum(e-s for s,e in motion[c])/max(1,n)]
+            grade = "good"
+            if (sci[c] is not None and sci[c] < cls.POOR[0]) or max(fractions) > cls.POOR[1]:
+                grade = "poor"
+            elif (sci[c] is not None and sci[c] < cls.FAIR[0]) or max(fractions) > cls.FAIR[1]:
+                grade = "fair"
+            channels.append({"sci":sci[c],"grade":grade,"flat":cls.toTimes(timebase,runs),
+                             "motion":cls.toTimes(timebase,motion[c])})
+        return channels
+
+    @classmethod
+    def toTimes(cls,timebase,runs):
+        """Convert [start, end) row runs to [start, end] times (s)"""
+        if not runs:
+            return []
+        runs = np.array(runs)
+        return np.column_stack([timebase.timesAt(runs[:,0]),timebase.timesAt(runs[:,1]-1)]).tolist()
+
+
+class RangeStats():
+    """Prefix Sums and Block Min/Max of one Channel, so Statistics of any Range Cost O(1).
+        Samples and times are centred first so the sums keep their precision, ranges of up to DIRECT_ROWS
+        are summed directly as prefix sums over hours of data cannot resolve them. Out-of-core stores
+        keep their sums in temporary files, so memory stays flat however long the recording"""
+    BLOCK = 256# Rows per min/max block
+    SECTION = 1024*256# Rows read at once while building, a whole number of blocks
+    DIRECT_ROWS = 4096# Shorter ranges are summed directly from the samples
+
+    def __init__(self,values,timebase,channel):
+        """Read the channel section by section from the first row the store still holds"""
+        self.values,self.channel = values,channel
+        self.first = fetchRows(values,0,1,[channel])[0]# Ring buffers drop their oldest rows
+        n = len(values)-self.first
+        allocate = np.zeros if isinstance(values,np.ndarray) else self.onDisk
+        self.prefix = {name:allocate(n+1) for name in ["n","sx","sxx","st","stt","stx","area","sdt"]}
+        self.centre = None
+        self.tcentre = float(timebase.timesAt(self.first+n//2)) if n else 0.0
+        nblocks = -(-n//self.BLOCK)
+        self.mins,self.maxs = [allocate(nblocks)],[allocate(nblocks)]
+        for j0 in range(0,n,self.SECTION):
+            first,x = fetchRows(values,self.first+j0,self.first+j0+self.SECTION,[channel])
+            if first != self.first+j0:
+                raise ValueError("Rows left the buffer while building range statistics")
+            x = x[:,0].astype(np.float64)
+            t = timebase.timesOf(first,first+len(x)+1)# One more row for the last interval
+            dt = np.diff(t) if len(t) > len(x) else np.append(np.diff(t),0.0)
+            t = t[:len(x)]
+            ok = np.isfinite(x)
+            if self.centre is None and ok.any():
+                self.centre = float(np.mean(x[ok]))
+            xc = np.where(ok,x-(self.centre or 0.0),0.0)
+            tc = np.where(ok,t-self.tcentre,0.0)
+            for name,a in [("n",ok),("sx",xc),("sxx",xc*xc),("st",tc),("stt",tc*tc),("stx",tc*xc),
+                           ("area",xc*dt),("sdt",np.where(ok,dt,0.0))]:# area is a left Riemann sum
+                self.prefix[name][j0+1:j0+len(x)+1] = self.prefix[name][j0]+np.cumsum(a)
+            pad = -len(x)%self.BLOCK
+            blocks = np.concatenate([x,np.full(pad,np.nan)]).reshape(-1,self.BLOCK)
+            k0 = j0//self.BLOCK
+            self.mins[0][k0:k0+len(blocks)] = np.fmin.reduce(blocks,axis=1)
+            self.maxs[0][k0:k0+len(blocks)] = np.fmax.reduce(blocks,axis=1)
+        self.centre = self.centre or 0.0
+        # Sparse tables over block min/max, level j holds the extreme of 2**j blocks from each block
+        while 2**len(self.mins) <= nblocks:
+            h = 2**(len(self.mins)-1)
+            for table,reduce in [(self.mins,np.fmin),(self.maxs,np.fmax)]:
+                level = allocate(len(table[-1])-h)
+                level[:] = reduce(table[-1][:-h],table[-1][h:])
+                table.append(level)
+
+    @staticmethod
+    def onDisk(size):
+        """Float array backed by a temporary file, removed once the array is released"""
+        return np.memmap(tempfile.TemporaryFile(),dtype=np.float64,mode="w+",shape=(max(1,size),))[:size]
+
+    def rows(self,i0,i1):
+        """Samples of local rows i0 to i1"""
+        return fetchRows(self.values,self.first+i0,self.first+i1,[self.channel])[1][:,0]
+
+    def extremes(self,i0,i1):
+        """Min and max of local rows i0 to i1, from whole blocks plus at most two partial ones"""
+        k0,k1 = -(-i0//self.BLOCK),i1//self.BLOCK
+        if k1 <= k0:
+            part = self.rows(i0,i1)
+            return np.fmin.reduce(part),np.fmax.reduce(part)
+        j = (k1-k0).bit_length()-1
+        parts = np.concatenate([self.rows(i0,k0*self.BLOCK),self.rows(k1*self.BLOCK,i1),
+                                [self.mins[j][k0],self.mins[j][k1-2**j],self.maxs[j][k0],self.maxs[j][k1-2**j]]])
+        return np.fmin.reduce(parts),np.fmax.reduce(parts)
+
+    def sums(self,timebase,i0,i1):
+        """Sums over local rows i0 to i1 about the returned centres of samples and times"""
+        if i1-i0 > self.DIRECT_ROWS:
+            sums = {name:float(a[i1]-a[i0]) for name,a in self.prefix.items()}
+            return sums,self.centre,self.tcentre
+        x = self.rows(i0,i1)
+        t = timebase.timesOf(self.first+i0,self.first+i1+1)
+        dt = np.diff(t) if len(t) > len(x) else np.append(np.diff(t),0.0)
+        ok = np.isfinite(x)
+        centre,tcentre = (float(x[ok][0]) if ok.any() else 0.0),float(t[0])
+        xc,tc = np.where(ok,x-centre,0.0),np.where(ok,t[:len(x)]-tcentre,0.0)
+        sums = {"n":ok.sum(),"sx":xc.sum(),"sxx":(xc*xc).sum(),"st":tc.sum(),"stt":(tc*tc).sum(),
+                "stx":(tc*xc).sum(),"area":(xc*dt).sum(),"sdt":np.where(ok,dt,0.0).sum()}
+        return sums,centre,tcentre
+
+    def current(self):
+        """Whether the sums cover every row of the store, a live store outgrows them"""
+        return self.first+len(self.prefix["n"])-1 == len(self.values)
+
+    def query(self,timebase,t0,t1):
+        """Get the mean, sd, min, max, least-squares slope (/s) and area (value x s) from t0 to t1,
+            or None if no samples lie in the range. Only rows built and still held by the store are used"""
+        last = len(self.prefix["n"])-1
+        held = fetchRows(self.values,0,1,[self.channel])[0]-self.first# Ring buffers drop their oldest rows
+        i0 = int(timebase.rowAt(t0))+1# First row after t0, or at it
+        if 0 < i0 and timebase.timesAt(i0-1) >= t0:
+            i0 -= 1
+        i0 = min(max(0,held,i0-self.first),last)
+        i1 = min(max(0,int(timebase.rowAt(t1))+1-self.first),last)
+        if i1 <= i0:
+            return None
+        s,centre,_ = self.sums(timebase,i0,i1)
+        n = s["n"]
+        if n < 1:
+            return None
+        mean = s["sx"]/n
+        var = max(0.0,s["sxx"]-n*mean*mean)/(n-1) if n > 1 else 0.0
+        stv = s["stt"]-s["st"]*s["st"]/n
+        slope = (s["stx"]-s["st"]*s["sx"]/n)/stv if stv > 0 else 0.0
+        lo,hi = self.extremes(i0,i1)
+        return {"mean":mean+centre,"sd":var**0.5,"min":lo,"max":hi,"slope":slope,
+                "area":s["area"]+centre*s["sdt"],"n":int(n)}
+
+
+class RangeStatsCache():
+    """Range Statistics of the Loaded Data by Channel, Built on a Worker and Read from the Tk Thread"""
+    ENTRIES = 64# Channels kept
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()# (data, channel) -> RangeStats, oldest first
+
+    def key(self,values,channel):
+        return (id(values),channel)
+
+    def get(self,values,channel):
+        """Get a channel's statistics, or None if they have not been built. Those of a live store
+            may cover fewer rows than it now holds, until they are rebuilt"""
+        with self.lock:
+            return self.entries.get(self.key(values,channel))
+
+    def has(self,values,channels):
+        """Whether every channel's statistics are built and cover the whole store"""
+        with self.lock:
+            stats = [self.entries.get(self.key(values,c)) for c in channels]
+        return all(s is not None and s.current() for s in stats)
+
+    def build(self,values,timebase,channels):
+        """Build any missing or outgrown channels, reading each in full once"""
+        for c in channels:
+            stats = self.get(values,c)
+            if stats is not None and stats.current():
+                continue
+            stats = RangeStats(values,timebase,c)
+            with self.lock:
+                self.entries[self.key(values,c)] = stats
+                if len(self.entries) > self.ENTRIES:
+                    self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RedrawScheduler():
+    """Coalesces DataPlayer Redraws into at most one Render per Display Frame"""
+    FRAME_MS = 16# Display frame period (ms)
+
+    def __init__(self,app):
+        self.app = app
+        self.dirty = []# DataPlayers awaiting a render
+        self.pending = False# Whether a flush is scheduled
+
+    def request(self,dp):
+        """Mark a DataPlayer as needing a render on the next frame"""
+        if dp not in self.dirty:
+            self.dirty.append(dp)
+        if not self.pending:
+            self.pending = True
+            self.app.root.after(self.FRAME_MS,self.flush)
+
+    def forget(self,dp):
+        """Drop a destroyed DataPlayer, any geometry in flight for it is discarded"""
+        self.app.tasks.cancel(("redraw",dp))
+        if dp in self.dirty:
+            self.dirty.remove(dp)
+
+    def flush(self):
+        """Prepare geometry for each dirty DataPlayer on the task pool, a newer request supersedes an older one"""
+        self.pending = False
+        for dp in self.dirty:
+            self.app.tasks.run(dp.prepare,dp.snapshot(),key=("redraw",dp),
+                               onDone=dp.render,onError=lambda e: print("Error Preparing Geometry:",e))
+        self.dirty = []
+
+
+class MarkerIndex():
+    """Timestamped Markers Kept Sorted, Range and Next/Previous Queries are O(log n + k)"""
+
+    def __init__(self):
+        self.times = []# Seconds in data time, ascending
+        self.labels = []
+
+    def __len__(self):
+        return len(self.times)
+
+    def add(self,t,label=""):
+        i = bisect.bisect_right(self.times,t)
+        self.times.insert(i,t)
+        self.labels.insert(i,label)
+
+    def extend(self,times,labels):
+        """Bulk insert, sorts once rather than inserting one at a time"""
+        pairs = sorted(zip(self.times+list(times),self.labels+list(labels)),key=lambda p: p[0])
+        self.times = [p[0] for p in pairs]
+        self.labels = [p[1] for p in pairs]
+
+    def remove(self,i):
+        del self.times[i]
+        del self.labels[i]
+
+    def between(self,a,b):
+        """Get (times, labels) of markers from a to b seconds"""
+        i0 = bisect.bisect_left(self.times,a)
+        i1 = bisect.bisect_right(self.times,b)
+        return self.times[i0:i1],self.labels[i0:i1]
+
+    def nextAfter(self,t):
+        """Get the first marker time after t, or None"""
+        i = bisect.bisect_right(self.times,t)
+        return self.times[i] if i < len(self.times) else None
+
+    def previousBefore(self,t):
+        """Get the last marker time before t, or None"""
+        i = bisect.bisect_left(self.times,t)
+        return self.times[i-1] if i > 0 else None
+
+    def nearest(self,t):
+        """Get the index of the marker closest to t, or None"""
+        i = bisect.bisect_left(self.times,t)
+        candidates = [j for j in [i-1,i] if 0 <= j < len(self.times)]
+        if candidates == []:
+            return None
+        return min(candidates,key=lambda j: abs(self.times[j]-t))
+
+
+class IntervalIndex():
+    """Interval Annotations in a Centred Interval Tree, Overlap Queries are O(log n + k)"""
+
+    def __init__(self):
+        self.intervals = []# (start, end, label) in data time seconds
+        self.starts = []# Sorted start times, for next/previous queries
+        self.tree = None# Rebuilt lazily after changes
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def add(self,start,end,label=""):
+        self.extend([(min(start,end),max(start,end),label)])
+
+    def extend(self,intervals):
+        self.intervals += [(min(s,e),max(s,e),l) for s,e,l in intervals]
+        self.starts = sorted(i[0] for i in self.intervals)
+        self.tree = None
+
+    def remove(self,interval):
+        self.intervals.remove(interval)
+        self.starts.remove(interval[0])
+        self.tree = None
+
+    def build(self,intervals):
+        """Build a tree node, each node holds the intervals containing its centre"""
+        if intervals == []:
+            return None
+        mids = sorted(intervals,key=lambda i: i[0]+i[1])
+        centre = (mids[len(mids)//2][0]+mids[len(mids)//2][1])/2# Inside an interval, so no node is empty
+        left = [i for i in intervals if i[1] < centre]
+        right = [i for i in intervals if i[0] > centre]
+        here = [i for i in intervals if i[0] <= centre <= i[1]]
+        byStart = sorted(here,key=lambda i: i[0])
+        byEnd = sorted(here,key=lambda i: -i[1])
+        return (centre,byStart,byEnd,self.build(left),self.build(right))
+
+    def overlapping(self,a,b):
+        """Get intervals overlapping a to b seconds"""
+        if self.tree is None:
+            if self.intervals == []:
+                return []
+            self.tree = self.build(self.intervals)
+        found = []
+        stack = [self.tree]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            centre,byStart,byEnd,left,right = node
+            if b < centre:# Node intervals all reach the centre, so overlap if they start by b
+                for i in byStart:
+                    if i[0] > b:
+                        break
+                    found.append(i)
+                stack.append(left)
+            elif a > centre:# Overlap if they end after a
+                for i in byEnd:
+                    if i[1] < a:
+                        break
+                    found.append(i)
+                stack.append(right)
+            else:# Centre is in range, every node interval overlaps
+                found += byStart
+                stack += [left,right]
+        return found
+
+    def nextAfter(self,t):
+        i = bisect.bisect_right(self.starts,t)
+        return self.starts[i] if i < len(self.starts) else None
+
+    def previousBefore(self,t):
+        i = bisect.bisect_left(self.starts,t)
+        return self.starts[i-1] if i > 0 else None
+
+
+def readMarkerCSV(path):
+    """Read markers from a .csv of time[,end][,label] rows, returns (markers, annotations)"""
+    markers,annotations = [],[]
+    with open(path,newline="") as file:
+        for row in csv.reader(file):
+            if row == [] or row[0].strip() == "":
+                continue
+            try:
+                start = float(row[0])
+            except ValueError:# Header
+                continue
+            end,label = None,""
+            if len(row) >= 3:
+                end = float(row[1]) if row[1].strip() else None
+                label = row[2]
+            elif len(row) == 2:
+                try:
+                    end = float(row[1]) if row[1].strip() else None
+                except ValueError:# time,label
+                    label = row[1]
+            if end is None:
+                markers.append((start,label))
+            else:
+                annotations.append((start,end,label))
+    return markers,annotations
+
+def writeMarkerCSV(path,markers,annotations):
+    """Write markers and annotations as time,end,label rows"""
+    with open(path,"w",newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["time","end","label"])
+        for t,label in zip(markers.times,markers.labels):
+            writer.writerow([t,"",label])
+        for start,end,label in sorted(annotations.intervals):
+            writer.writerow([start,end,label])
+
+
+def cacheKey(path,*params):
+    """Name of a file's cached derivative, a hash of its path, size, time modified and the derivative's params,
+        so an edited or replaced file is never matched to a stale cache"""
+    stat = os.stat(path)
+    key = "|".join(str(p) for p in [os.path.abspath(path),stat.st_size,stat.st_mtime]+list(params))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+class ProxyCache():
+    """Builds Display-Sized, All-Intra Proxies of Videos in the Background with ffmpeg"""
+    DIRECTORY = "proxy_cache"
+
+    def __init__(self):
+        self.building = {}# Proxy path -> callbacks waiting on it
+        self.lock = threading.Lock()
+
+    def pathFor(self,path,w,h,fps):
+        """Get the cache path of a proxy, keyed by source file, size, time modified and display format"""
+        return os.path.join(self.DIRECTORY,cacheKey(path,"{0}x{1}".format(w,h),fps)+".avi")
+
+    def request(self,path,w,h,fps,callback):
+        """Call callback(path, proxy) once a proxy exists, from a background thread if it must be built"""
+        try:
+            proxy = self.pathFor(path,w,h,fps)
+        except OSError:# Source missing
+            return
+        if os.path.isfile(proxy):
+            callback(path,proxy)
+            return
+        with self.lock:
+            if proxy in self.building:# Already being built for another pane
+                self.building[proxy].append(callback)
+                return
+            self.building[proxy] = [callback]
+        threading.Thread(target=self.build,args=(path,proxy,w,h,fps),daemon=True).start()
+
+    def build(self,path,proxy,w,h,fps):
+        """Transcode to a display-sized MJPEG proxy, every frame is a keyframe so seeks are cheap"""
+        print("Preparing Proxy...")
+        t_start = time.time()
+        os.makedirs(self.DIRECTORY,exist_ok=True)
+        partial = proxy+".part.avi"
+        command = "ffmpeg -y -i \"{0}\" -an -vf scale={1}:{2} -r {3} -c:v mjpeg -q:v 4 \"{4}\"".format(path,w,h,fps,partial)
+        result = run(command,stdout=PIPE,stderr=PIPE,universal_newlines=True,shell=True)
+        built = result.returncode == 0 and os.path.isfile(partial)
+        if built:
+            os.replace(partial,proxy)# Only complete proxies are ever picked up
+            print("Proxy Done[{0}]".format(int(time.time()-t_start)))
+        else:
+            print("Error Preparing Proxy")
+        with self.lock:
+            callbacks = self.building.pop(proxy,[])
+        if not built:
+            return
+        for callback in callbacks:
+            callback(path,proxy)
+
+
+class FrameCache():
+    """Memory-Bounded LRU Cache of Decoded, Display-Sized Frames, Only Used from the Tk Thread"""
+
+    def __init__(self,budget):
+        self.budget = budget# Bytes
+        self.frames = collections.OrderedDict()# (video path, frame index) -> PIL image, oldest first
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self,key):
+        """Get a cached frame, or None"""
+        image = self.frames.get(key)
+        if image is None:
+            self.misses += 1
+            return None
+        self.frames.move_to_end(key)
+        self.hits += 1
+        return image
+
+    def put(self,key,image):
+        """Cache a frame, evicting the least recently used frames over budget"""
+        nbytes = image.width*image.height*len(image.getbands())
+        if nbytes > self.budget:
+            return
+        if key in self.frames:
+            old = self.frames.pop(key)
+            self.size -= old.width*old.height*len(old.getbands())
+        self.frames[key] = image
+        self.size += nbytes
+        while self.size > self.budget:
+            _,old = self.frames.popitem(last=False)
+            self.size -= old.width*old.height*len(old.getbands())
+
+    def stats(self):
+        """Describe cache usage and hit rate"""
+        lookups = self.hits+self.misses
+        return "Frames Cached\t{0}\nMemory Used\t{1:.1f}/{2:.0f}MB\nHits\t\t{3}\nMisses\t\t{4}\nHit Rate\t\t{5:.0%}".format(
+            len(self.frames),self.size/2**20,self.budget/2**20,self.hits,self.misses,self.hits/lookups if lookups else 0)
+
+
+class Task():
+    """Handle on Work Submitted to the TaskManager"""
+
+    def __init__(self,key,gen):
+        self.key = key# Tasks sharing a key supersede each other, None for independent tasks
+        self.gen = gen# Submission order
+        self.cancelled = False
+
+    def cancel(self):
+        """Skip the task if it has not started, and discard its result if it has"""
+        self.cancelled = True
+
+
+class TaskManager():
+    """Worker Pool for Loading, Decoding and Processing, Results are Applied to Widgets on the Tk Thread
+
+    Only the Tk thread may touch widgets, so workers never call back directly. Their results are queued
+    and applied by poll, which the Tk event loop runs every POLL_MS. A task submitted with a key supersedes
+    older tasks with the same key: those not yet started are skipped, and a result is never applied after
+    a newer one for the same key. cv2 and numpy release the GIL, so decoding and parsing run in parallel"""
+    POLL_MS = 16# Display frame period (ms)
+
+    def __init__(self,root,workers=None):
+        self.root = root
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 2,thread_name_prefix="task")
+        self.lock = threading.Lock()
+        self.gen = 0
+        self.latest = {}# Newest task per key
+        self.applied = {}# Generation of the last result applied per key, Tk thread only
+        self.results = queue.Queue()# (task, callback, args) to run on the Tk thread
+        self.root.after(self.POLL_MS,self.poll)
+
+    def submit(self,fn,*args):
+        """Run fn(*args) on the pool and return its future, for callers that poll for the result themselves"""
+        return self.executor.submit(fn,*args)
+
+    def run(self,fn,*args,key=None,onDone=None,onError=None):
+        """Run fn(*args) on the pool, then onDone(result) or onError(exception) on the Tk thread"""
+        with self.lock:
+            self.gen += 1
+            task = Task(key,self.gen)
+            if key is not None:
+                self.latest[key] = task
+        self.executor.submit(self.work,task,fn,args,onDone,onError)
+        return task
+
+    def call(self,fn,*args):
+        """Run fn(*args) on the Tk thread, safe to call from any thread"""
+        self.results.put((None,fn,args))
+
+    def cancel(self,key):
+        """Cancel every task with key"""
+        with self.lock:
+            task = self.latest.pop(key,None)
+        if task is not None:
+            task.cancel()
+        self.applied.pop(key,None)
+
+    def isCurrent(self,task):
+        """Whether no newer task with the same key has been submitted"""
+        return not task.cancelled and (task.key is None or self.latest.get(task.key) is task)
+
+    def work(self,task,fn,args,onDone,onError):
+        """Worker side of run"""
+        if not self.isCurrent(task):
+            return
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self.results.put((task,onError or self.report,(e,)))
+            return
+        if onDone is not None:
+            self.results.put((task,onDone,(result,)))
+
+    def report(self,e):
+        """Default onError"""
+        print("Error in Background Task:",e)
+
+    def poll(self):
+        """Apply queued results in the Tk thread, skipping any overtaken by a newer result for the same key"""
+        pending = []
+        while not self.results.empty():
+            pending.append(self.results.get())
+        newest = {}
+        for task,_,_ in pending:
+            if task is not None and task.key is not None:
+                newest[task.key] = max(newest.get(task.key,0),task.gen)
+        for task,fn,args in pending:
+            if task is not None:
+                if task.cancelled or (task.key is not None and (task.key not in self.latest or task.gen < newest[task.key]
+                                                                or task.gen <= self.applied.get(task.key,0))):
+                    continue
+                if task.key is not None:
+                    self.applied[task.key] = task.gen
+            try:
+                fn(*args)
+            except Exception as e:
+                print("Error Applying Task Result:",e)
+        self.root.after(self.POLL_MS,self.poll)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+def probeKeyframes(path,fps):
+    """Get the frame indices of a video's keyframes, from packet flags so nothing is decoded, or None"""
+    command = "ffprobe -v error -select_streams v:0 -show_entries packet=pts_time,flags -of csv=p=0 \"{0}\"".format(path)
+    result = run(command,stdout=PIPE,stderr=DEVNULL,universal_newlines=True,shell=True)
+    times,keys = [],[]
+    for line in result.stdout.splitlines():
+        fields = line.split(",")
+        try:
+            times.append(float(fields[0]))
+        except ValueError:# No timestamp
+            continue
+        keys.append("K" in fields[1] if len(fields) > 1 else False)
+    if result.returncode != 0 or not any(keys):
+        return None
+    times = np.array(times)
+    frames = np.round((times[np.array(keys)]-times.min())*fps).astype(int)# Frame 0 is the first presented
+    return np.unique(frames)
+
+class VideoPane():
+    """Video Display Widget, Frames are Decoded on the Task Pool and Follow the Player's Clock"""
+    GRAB_AHEAD = 30# Frames to step forward by grabbing, rather than seeking
+    KEYFRAME_RATE = 4# Playback rates from which only keyframes are decoded
+
+    def __init__(self,root,app,row=0,column=0,w=640,h=400,offset=0):
+        """Initialises video pane into root"""
+        self.app = app
+        # Create Label to stream video into
+        self.root = root
+        self.player = tk.Label(root,bg='#000000')
+        self.player.grid(row=row,column=column,sticky=tk.NW)
+
+        # Video Player Width And Height
+        self.w,self.h = w,h
+
+        # Video
+        self.vid_path = ""
+        self.vid = None
+        self.vid_len = 0
+        self.fps = 25
+        self.delay = 40
+        self.offset = offset# Seconds this video lags the playback clock
+
+        # Decoding
+        self.future = None# Frame being decoded on the decode pool
+        self.futureIndex = None# Index of the frame being decoded
+        self.requested = None# Frame index last requested
+        self.proxy = None# Path of the proxy being decoded, if any
+        self.proxyReady = None# Proxy built in the background, swapped in when the decoder is idle
+        self.keyframes = None# Sorted keyframe indices of the source, for fast playback
+
+        # Black Frame, drawn with Tk so PIL is not needed at startup
+        self.blackFrame = tk.PhotoImage(width=self.w,height=self.h)
+        self.blackFrame.put("#000000",to=(0,0,self.w,self.h))
+        self.setBlackFrame()
+
+    def openVideo(self,path):
+        """Get cv2 video capture object and stream properties"""
+        self.vid_path = path
+        self.vid = cv2.VideoCapture(self.vid_path)
+        self.fps = self.vid.get(cv2.CAP_PROP_FPS) or 25
+        self.delay = int(1000/self.fps)
+        self.vid_len = int(self.vid.get(cv2.CAP_PROP_FRAME_COUNT))/self.fps
+        self.requested = None
+        self.proxy,self.proxyReady = None,None
+        if self.app.useProxies:# Source is decoded until the proxy exists
+            self.app.proxyCache.request(path,self.w,self.h,self.fps,self.setProxyReady)
+        self.keyframes = None
+        self.app.tasks.run(probeKeyframes,path,self.fps,key=("keyframes",self),
+                           onDone=lambda keyframes: self.setKeyframes(path,keyframes))
+
+    def setKeyframes(self,path,keyframes):
+        if path == self.vid_path:
+            self.keyframes = keyframes
+
+    def setProxyReady(self,path,proxy):
+        """Called when a proxy exists, possibly from a background thread"""
+        if path == self.vid_path:# Ignore proxies of a previously loaded video
+            self.proxyReady = proxy
+
+    def switchToProxy(self):
+        """Decode from the proxy instead of the source, only while no frame is being decoded"""
+        proxy,self.proxyReady = self.proxyReady,None
+        vid = cv2.VideoCapture(proxy)
+        if not vid.isOpened():
+            print("Error Opening Proxy")
+            return
+        if self.vid is not None:
+            self.vid.release()
+        self.vid,self.proxy = vid,proxy
+        self.requested = None
+
+    def setPlaceholder(self,text):
+        """Show a message over the frame, empty text removes it"""
+        self.player.config(text=text,compound=tk.CENTER,fg="#ffffff")
+
+    def setBlackFrame(self):
+        """Sets Widget to Display a Black Frame with Default Proportions"""
+        self.player.config(image=self.blackFrame)
+        self.player.image = self.blackFrame
+
+    def decodeFrame(self,index,grab=True):
+        """Decode frame index to a display-sized image, runs on the decode pool.
+            Keyframes are always sought rather than grabbed to, so the frames between are not decoded"""
+        if self.vid is None or index < 0 or index >= self.vid_len*self.fps:
+            return None
+        pos = int(self.vid.get(cv2.CAP_PROP_POS_FRAMES))
+        if index < pos or index > pos+(self.GRAB_AHEAD if grab else 0):# Seek
+            self.vid.set(cv2.CAP_PROP_POS_FRAMES,index)
+        else:# Close ahead, skip frames without converting them
+            for _ in range(index-pos):
+                self.vid.grab()
+        succ, image = self.vid.read()
+        if not succ:
+            return None
+        # Frame processing pipeline, proxies are already display-sized
+        if image.shape[:2] != (self.h,self.w):
+            image = cv2.resize(image, dsize=(self.w,self.h))
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        return Image.fromarray(image)
+
+    def showFrame(self,image):
+        """Set label image to a decoded frame, black if none"""
+        if image is None:
+            self.setBlackFrame()
+            return
+        frame = ImageTk.PhotoImage(image)
+        self.player.config(image=frame)
+        self.player.image = frame
+
+    def requestFrame(self,seconds,pool,rate=1):
+        """Show the last decoded frame and request the frame at seconds, dropping frames while the decoder is busy.
+            From KEYFRAME_RATE the source's last keyframe is shown instead, proxies are all keyframes already"""
+        if self.future is not None:
+            if not self.future.done():
+                return
+            try:
+                image = self.future.result()
+                if image is not None:
+                    self.app.frameCache.put((self.vid_path,self.futureIndex),image)
+                self.showFrame(image)
+            except Exception as e:
+                print("Error Decoding Frame:",e)
+            self.future = None
+        if self.proxyReady is not None:
+            self.switchToProxy()
+        index = int(np.floor((seconds-self.offset)*self.fps))
+        keyframeOnly = rate >= self.KEYFRAME_RATE and self.proxy is None and self.keyframes is not None
+        if keyframeOnly:
+            index = int(self.keyframes[max(0,np.searchsorted(self.keyframes,index,side="right")-1)])
+        if index != self.requested:
+            self.requested = index
+            image = self.app.frameCache.get((self.vid_path,index))
+            if image is not None:# Recently decoded, skip decoding entirely
+                self.showFrame(image)
+                return
+            self.futureIndex = index
+            self.future = pool.submit(self.decodeFrame,index,not keyframeOnly)
+
+    def release(self):
+        """Release the video and remove the widget, a frame still being decoded finishes first"""
+        vid = self.vid
+        if vid is not None:
+            if self.future is not None and not self.future.cancel():# Running, release once it returns
+                self.future.add_done_callback(lambda future: vid.release())
+            else:
+                vid.release()
+        self.player.destroy()
+
+
+class VideoPlayer(VideoPane):
+    """Video Player Widget, Owns the Playback Clock and Audio for all Video Panes"""
+    ENVELOPE_PATH = "project_audio_envelope.npz"# Waveform of the cached audio
+    RATES = [1,2,4,8,16]# Playback rates, audio is muted at all but 1x
 
     class State(Enum):
         """Nested Inner Class for Video Player States"""
@@ -895,30 +3439,25 @@ class VideoPlayer():
     
     def __init__(self,root,app,row=0,column=0,w=640,h=400):
         """Initialises video player into root"""
-        self.app = app
-        # Create Label to stream video into
-        self.root = root
-        self.player = tk.Label(root,bg='#000000')
-        self.player.grid(row=row,column=column,sticky=tk.NW)
-        self.startTimestamp = time.time()# Timestamp when video started (so correct frame is drawn)
-        mixer.init()
-
-        # Video Player Width And Height
-        self.w,self.h = w,h
+        VideoPane.__init__(self,root,app,row=row,column=column,w=w,h=h)
+        # Playback clock, runs rate times faster than wall time
+        self.rate = 1
+        self.clockBase,self.clockWall = time.time(),time.time()# Clock reading at the last rate change, and when
+        self.startTimestamp = self.now()# Timestamp when video started (so correct frame is drawn)
+        self.mixerReady = False# Mixer is initialised when the first video is loaded
 
         # State
         self.state = VideoPlayer.State.EMPTY
         self.progress = 0
         self.hasAudio = False
         
-        # Video
-        self.vid_path = ""
+        # Audio
         self.aud_path = ""
-        self.vid = None
-        self.vid_len = 0
 
-        # Black Frame
-        self.setBlackFrame()
+        # Additional video panes slaved to this player's clock. Decoding has its own pool, so parsing and
+        # scans on the app's task pool never hold up a frame, each pane has at most one frame in flight
+        self.panes = []
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 2,thread_name_prefix="decode")
     # For comparing states
     def isPlaying(self):
         return self.state == VideoPlayer.State.PLAYING
@@ -928,6 +3467,22 @@ class VideoPlayer():
         return self.state == VideoPlayer.State.STOPPED
     def isEmpty(self):
         return self.state == VideoPlayer.State.EMPTY
+    def audible(self):
+        return self.hasAudio and self.rate == 1
+
+    def now(self):
+        """Read the playback clock, which replaces time.time() so every position follows the rate"""
+        return self.clockBase+(time.time()-self.clockWall)*self.rate
+
+    def setRate(self,rate):
+        """Change the playback rate without moving the playback position"""
+        self.clockBase,self.clockWall = self.now(),time.time()
+        self.rate = rate
+        if self.hasAudio and self.isPlaying():
+            if self.audible():
+                mixer.music.play(start=max(0,self.now()-self.startTimestamp),loops=0)
+            else:
+                mixer.music.stop()
     def loadAudio(self,path):
         """Extract Audio From File, Save as MP3, Load"""
         if self.vid:# Release video to access
@@ -940,15 +3495,23 @@ class VideoPlayer():
             self.hasAudio = True
         else:
             self.hasAudio = False
+            self.app.tasks.call(self.app.setAudioEnvelope,None)
             return
         print("Preparing Audio...",end="")
         filename = "project_audio.mp3"
         self.aud_path = filename
         t_start = time.time()
-        # Extract audio using ffmpeg, always overwrite
-        command = "ffmpeg -y -i \"{0}\" \"{1}\"".format(path,filename)
-        result = run(command,stdout=PIPE,stderr=PIPE,universal_newlines=True,shell=True)
-##        print(result.stderr)
+        # Extract audio using ffmpeg, always overwrite, and decode it to PCM in the same pass for the waveform
+        command = "ffmpeg -y -loglevel error -i \"{0}\" \"{1}\" {2}".format(path,filename,AudioEnvelope.PCM_ARGS)
+        process = Popen(command,stdout=PIPE,stderr=DEVNULL,shell=True)
+        try:
+            envelope = AudioEnvelope.fromPCM(process.stdout)
+        finally:
+            process.stdout.close()
+            process.wait()
+        if envelope is not None:
+            envelope.save(self.ENVELOPE_PATH)
+        self.app.tasks.call(self.app.setAudioEnvelope,envelope)
         t_end = time.time()
         print("Done[{0}]".format(int(t_end-t_start)))
         try:
@@ -957,7 +3520,7 @@ class VideoPlayer():
         except:
             print("Error Loading Audio")
             self.hasAudio = False
-        self.vid = cv2.VideoCapture(self.vid_path)# Reload video component
+        self.vid = cv2.VideoCapture(self.proxy or self.vid_path)# Reload video component
         # Launch in GUI Thread
     def loadCachedAudio(self):
         """Unstable, for testing purposes only"""
@@ -971,15 +3534,28 @@ class VideoPlayer():
             mixer.music.unload()
             self.aud_path = None
             self.hasAudio = False
+            self.app.tasks.call(self.app.setAudioEnvelope,None)
+            return
+        envelope = None
+        try:
+            if os.path.isfile(self.ENVELOPE_PATH):
+                envelope = AudioEnvelope.load(self.ENVELOPE_PATH)
+            else:# Cached before waveforms were shown
+                envelope = AudioEnvelope.build("project_audio.mp3")
+                if envelope is not None:
+                    envelope.save(self.ENVELOPE_PATH)
+        except Exception as e:
+            print("Error Loading Audio Waveform:",e)
+        self.app.tasks.call(self.app.setAudioEnvelope,envelope)
 
     def loadVideo(self,path,loadAudio=True):
         """Select a video for the player, if loadAudio is False it will use the cached audio"""
+        if not self.mixerReady:
+            mixer.init()
+            self.mixerReady = True
         self.aud_path = ""
-        # Get cv2 video capture object
-        self.vid_path = path
-        self.vid = cv2.VideoCapture(self.vid_path)
-        self.delay = int(1000/self.vid.get(cv2.CAP_PROP_FPS))
-        self.vid_len = int(self.vid.get(cv2.CAP_PROP_FRAME_COUNT))/self.vid.get(cv2.CAP_PROP_FPS)
+        self.openVideo(path)
+        self.app.tasks.call(self.app.setFilmstrip,path,self.vid_len)
         self.state = VideoPlayer.State.STOPPED
         self.hasAudio = True# If no audio in video, ignore audio
         if loadAudio:
@@ -990,11 +3566,11 @@ class VideoPlayer():
     def updateDataplayers(self):
         """Update dataplayer objects"""
         if self.state == VideoPlayer.State.PAUSED:
-            self.app.updateDataplayers(time.time()-self.progress)
+            self.app.updateDataplayers(self.now()-self.progress)
         elif self.state == VideoPlayer.State.PLAYING:
             self.app.updateDataplayers(self.startTimestamp)
         elif self.state == VideoPlayer.State.STOPPED:
-            self.app.updateDataplayers(time.time())
+            self.app.updateDataplayers(self.now())
 
     def play(self,event=None):
         """Causes the media to play, or resume playing"""
@@ -1003,9 +3579,9 @@ class VideoPlayer():
             return
         # If stop -> play, restart clip
         elif self.isStopped():
-            if self.hasAudio:
+            if self.audible():
                 mixer.music.play(loops=0)
-            self.startTimestamp = time.time()
+            self.startTimestamp = self.now()
         # If pause -> play, set progress and resume
         elif self.isPaused():
             if self.hasAudio:
@@ -1019,12 +3595,10 @@ class VideoPlayer():
     def seek(self,t):
         """Seek to time t and play"""
         if (t > self.vid_len) or (t < 0):# If seeking to beyond end of video
-            frame = ImageTk.PhotoImage(Image.fromarray(np.array([[0]*self.w]*self.h)))# Set frame to a black image of same proportions
-            self.player.config(image=frame)
-            self.player.image = frame
+            self.setBlackFrame()# Set frame to a black image of same proportions
             self.root.update_idletasks()
-        self.startTimestamp = time.time() - t
-        if self.hasAudio:
+        self.startTimestamp = self.now() - t
+        if self.audible():
             mixer.music.play(start=t,loops=0)
         self.updateDataplayers()
         # If already playing, skip calling the stream method, or if no video data loaded
@@ -1039,7 +3613,7 @@ class VideoPlayer():
         if not self.isPlaying():
             return
         # If play -> pause
-        self.progress = time.time() - self.startTimestamp
+        self.progress = self.now() - self.startTimestamp
         if self.hasAudio:
             mixer.music.pause()
         self.state = VideoPlayer.State.PAUSED
@@ -1053,13 +3627,41 @@ class VideoPlayer():
             mixer.music.stop()
         self.state = VideoPlayer.State.STOPPED
         self.progress = 0
-        self.startTimestamp = time.time()
+        self.startTimestamp = self.now()
 
-    def setBlackFrame(self):
-        """Sets Widget to Display a Black Frame with Default Proportions"""
-        frame = ImageTk.PhotoImage(Image.fromarray(np.array([[0]*self.w]*self.h)))
-        self.player.config(image=frame)
-        self.player.image = frame
+    def step(self,frames):
+        """Move a paused or stopped player by a number of frames and show them without playing"""
+        self.state = VideoPlayer.State.PAUSED
+        index = int(np.floor(self.progress*self.fps))+frames
+        self.progress = max(0,min(index,self.vid_len*self.fps-1))/self.fps+0.5/self.fps# Middle of the frame
+        self.showPaused()
+
+    def showPaused(self):
+        """Show every pane's frame at the paused position, polling until decoding finishes"""
+        if not self.isPaused():
+            return
+        busy = False
+        for pane in [self]+self.panes:
+            pane.requestFrame(self.progress,self.pool)
+            busy = busy or pane.future is not None
+        self.root.update_idletasks()
+        if busy:
+            self.root.after(5,self.showPaused)
+
+    def addPane(self,path,row=0,column=0,offset=0,load=True):
+        """Add a video pane that plays in sync with this player, if load is False the caller opens the video"""
+        pane = VideoPane(self.root,self.app,row=row,column=column,w=self.w,h=self.h,offset=offset)
+        pane.vid_path = path
+        if load:
+            pane.openVideo(path)
+        self.panes.append(pane)
+        return pane
+
+    def removePanes(self):
+        """Remove all additional video panes"""
+        for pane in self.panes:
+            pane.release()
+        self.panes = []
 
     def stream(self,event=None):
         """Start a video update loop"""
@@ -1068,37 +3670,21 @@ class VideoPlayer():
             return
 
         # Calculate elapsed time
-        seconds = time.time() - self.startTimestamp
+        seconds = self.now() - self.startTimestamp
 
         if seconds < 0:
             if mixer.music.get_busy():
                 mixer.music.pause()
         elif seconds < self.vid_len:
-            if not mixer.music.get_busy() and self.hasAudio:
+            if not mixer.music.get_busy() and self.audible():
                 mixer.music.play(loops=0)
                 self.play()
-        else:# seconds > self.vid_len
+        elif self.rate == 1:# seconds > self.vid_len
             mixer.music.play(start=seconds,loops=0)
         
-        # Set frame number
-        self.vid.set(cv2.CAP_PROP_POS_MSEC,seconds*1000)
-
-        # Get next frame
-        succ, image = self.vid.read()
-        if not succ:
-            self.setBlackFrame()
-            self.updateDataplayers()
-            self.player.after(self.delay//2, self.stream)
-            return
-        else:
-            # Frame processing pipeline
-            image = cv2.resize(image, dsize=(self.w,self.h))
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-            frame = ImageTk.PhotoImage(Image.fromarray(image))
-
-        # Set label image to frame
-        self.player.config(image=frame)
-        self.player.image = frame
+        # Show decoded frames and request the next ones, every pane decodes in parallel on the pool
+        for pane in [self]+self.panes:
+            pane.requestFrame(seconds,self.pool,self.rate)
         self.root.update_idletasks()
 
         self.updateDataplayers()
@@ -1107,8 +3693,568 @@ class VideoPlayer():
         self.player.after(self.delay//2, self.stream)# self.delay, or 0 for best video framerate
 
 
+class ChunkedStore():
+    """Recording Converted to Fixed-Size On-Disk Blocks per Channel, with Per-Block Min/Max Summaries,
+        Read Through an LRU Block Cache so Memory Stays Flat Regardless of Recording Length"""
+    BLOCK_ROWS = 256# Samples per block
+    DIRECTORY = "block_cache"
+
+    def __init__(self,directory,cacheBytes):
+        """Open a converted recording, summaries and timestamps are memory-mapped rather than loaded"""
+        with open(os.path.join(directory,"meta.json")) as file:
+            meta = json.load(file)
+        self.directory = directory
+        self.sensors = meta["sensors"]
+        self.samplerate = meta["samplerate"]
+        self.measurements = meta["measurements"]
+        self.blockRows = meta["blockrows"]
+        self.mins = np.load(os.path.join(directory,"mins.npy"),mmap_mode="r")# (blocks x channels)
+        self.maxs = np.load(os.path.join(directory,"maxs.npy"),mmap_mode="r")
+        timestamps = None
+        if meta["timestamps"]:# Only stored for irregular sampling, already relative to the first row
+            timestamps = np.memmap(os.path.join(directory,"timestamps.f64"),dtype=np.float64,mode="r")
+        self.timebase = Timebase(self.samplerate,timestamps,normalised=True)
+        self.files = {}# Channel -> open block file
+        self.cache = collections.OrderedDict()# (channel, block) -> samples, oldest first
+        self.cacheBlocks = max(2,int(cacheBytes//(self.blockRows*8)))
+        self.lock = threading.Lock()
+
+    @classmethod
+    def open(cls,path,cacheBytes):
+        """Open the block store of a recording, converting it first if it has not been already"""
+        directory = os.path.join(cls.DIRECTORY,cacheKey(path,cls.BLOCK_ROWS))
+        if not os.path.isfile(os.path.join(directory,"meta.json")):
+            cls.convert(path,directory)
+        return cls(directory,cacheBytes)
+
+    @classmethod
+    def convert(cls,path,directory):
+        """Stream a recording into per-channel block files, never holding more than one block of rows.
+            Rows are assumed to be in time order"""
+        print("Converting to Blocks...",end="")
+        t_start = time.time()
+        partial = directory+".part"
+        shutil.rmtree(partial,ignore_errors=True)
+        os.makedirs(partial)
+        source = TailSource(path)
+        match_time = re.compile(MATCH_TIME,re.IGNORECASE)
+        files,timeFile,timeCol = None,None,None
+        mins,maxs,pending = [],[],[]
+        count = 0
+        def flush(rows):
+            block = np.array(rows,dtype=np.float64)
+            if timeCol is not None:
+                block[:,timeCol].tofile(timeFile)
+                block = np.delete(block,timeCol,axis=1)
+            for c,file in enumerate(files):
+                np.ascontiguousarray(block[:,c]).tofile(file)
+            mins.append(np.fmin.reduce(block,axis=0))# Ignores missing readings
+            maxs.append(np.fmax.reduce(block,axis=0))
+        try:
+            while True:
+                chunk = source.file.read(2**22)
+                if not chunk:
+                    break
+                for row in source.parse(chunk):
+                    if files is None:# Header is known once the first row arrives
+                        sensors = list(source.sensors)
+                        for k,name in enumerate(sensors):
+                            if name and match_time.match(name):
+                                timeCol = k
+                                timeFile = open(os.path.join(partial,"timestamps.f64"),"wb")
+                                sensors.pop(k)
+                                break
+                        files = [open(os.path.join(partial,"ch{0}.f64".format(c)),"wb") for c in range(len(sensors))]
+                    pending.append(row)
+                    if len(pending) == cls.BLOCK_ROWS:
+                        flush(pending)
+                        count += len(pending)
+                        pending = []
+            if files is None:
+                raise ValueError("No data found in {0}".format(path))
+            if pending:
+                flush(pending)
+                count += len(pending)
+        finally:
+            source.close()
+            for file in (files or [])+([timeFile] if timeFile else []):
+                file.close()
+        samplerate = source.samplerate
+        timestamps = False
+        if timeCol is not None:
+            timestamps = cls.normaliseTimestamps(os.path.join(partial,"timestamps.f64"),samplerate)
+            if samplerate is None:
+                ts = np.memmap(os.path.join(partial,"timestamps.f64"),dtype=np.float64,mode="r")
+                samplerate = (count-1)/(ts[-1]-ts[0]) if count > 1 and ts[-1] > ts[0] else 1
+                del ts
+        np.save(os.path.join(partial,"mins.npy"),np.array(mins))
+        np.save(os.path.join(partial,"maxs.npy"),np.array(maxs))
+        with open(os.path.join(partial,"meta.json"),"w") as file:# Written last, marks a complete conversion
+            json.dump({"sensors":sensors,"samplerate":samplerate or 1,"measurements":count,
+                       "blockrows":cls.BLOCK_ROWS,"timestamps":timestamps},file)
+        shutil.rmtree(directory,ignore_errors=True)
+        os.replace(partial,directory)
+        print("Done[{0}]".format(int(time.time()-t_start)))
+
+    @classmethod
+    def normaliseTimestamps(cls,path,samplerate):
+        """Make timestamps relative to the first row, block by block. Returns whether they are irregular,
+            uniform timestamps are deleted so the O(1) path is used"""
+        ts = np.memmap(path,dtype=np.float64,mode="r+")
+        irregular = samplerate is None
+        t0 = float(ts[0]) if len(ts) else 0
+        for i in range(0,len(ts),2**20):
+            ts[i:i+2**20] -= t0
+            if not irregular:
+                nominal = np.arange(i,min(i+2**20,len(ts)))/samplerate
+                irregular = bool(np.max(np.abs(ts[i:i+2**20]-nominal)) >= 0.5/samplerate)
+        ts.flush()
+        del ts
+        if not irregular:
+            os.remove(path)
+        return irregular
+
+    def __len__(self):
+        return self.measurements
+
+    def block(self,channel,k):
+        """Get a block of one channel, from the cache or disk"""
+        with self.lock:
+            samples = self.cache.get((channel,k))
+            if samples is not None:
+                self.cache.move_to_end((channel,k))
+                return samples
+            if channel not in self.files:
+                self.files[channel] = open(os.path.join(self.directory,"ch{0}.f64".format(channel)),"rb")
+            file = self.files[channel]
+            file.seek(k*self.blockRows*8)
+            samples = np.fromfile(file,dtype=np.float64,count=self.blockRows)
+            self.cache[(channel,k)] = samples
+            if len(self.cache) > self.cacheBlocks:
+                self.cache.popitem(last=False)
+            return samples
+
+    def fetch(self,i0,i1,cols):
+        """Get rows i0 to i1 of the given columns, reading only the blocks they intersect"""
+        i0,i1 = max(0,i0),min(i1,self.measurements)
+        if i1 <= i0:
+            return i0,np.empty((0,len(cols)))
+        k0,k1 = i0//self.blockRows,(i1-1)//self.blockRows+1
+        rows = np.empty((i1-i0,len(cols)))
+        for j,c in enumerate(cols):
+            samples = np.concatenate([self.block(c,k) for k in range(k0,k1)])
+            rows[:,j] = samples[i0-k0*self.blockRows:i1-k0*self.blockRows]
+        return i0,rows
+
+    def summarise(self,i0,i1,cols):
+        """Get the first row, min and max of each block intersecting rows i0 to i1"""
+        k0,k1 = max(0,i0)//self.blockRows,(max(i0+1,i1)-1)//self.blockRows+1
+        return np.arange(k0,k1)*self.blockRows,self.mins[k0:k1][:,cols],self.maxs[k0:k1][:,cols]
+
+
+class SnirfStore():
+    """Lazily Read SNIRF (HDF5) Recording, Only the Time Axis and Channel Names are Loaded on Open,
+        Samples are Read from the First Data Block of the File Range by Range, only for the Channels Asked for"""
+    KINDS = {"HbO":"O2Hb","HbR":"HHb","HbT":"HbT"}# SNIRF data type labels, named as in the vendor export
+    BLOCK_ROWS = 256# Samples per min/max summary block
+    SECTION_ROWS = 256*1024# Rows read at once while summarising, bounds memory
+
+    def __init__(self,path):
+        self.file = h5py.File(path,"r")
+        nirs = self.file[sorted(k for k in self.file.keys() if k.startswith("nirs"))[0]]
+        data = nirs["data1"]
+        self.dataset = data["dataTimeSeries"]# (time x channels), not read here
+        self.lock = threading.Lock()# h5py serialises access, but a file handle is not shared safely
+        self.measurements = self.dataset.shape[0]
+        self.blockRows = self.BLOCK_ROWS
+        self.summaries = {}# Channel -> (mins, maxs) per block, built the first time the channel is summarised
+        # Time is either one value per row, or [start, step]
+        time_ = data["time"][()].ravel()
+        if len(time_) == 2 and self.measurements != 2:
+            self.samplerate = 1/time_[1]
+            self.timestamps = None
+        else:
+            self.timestamps = time_
+            self.samplerate = (len(time_)-1)/(time_[-1]-time_[0]) if len(time_) > 1 and time_[-1] > time_[0] else 1
+        # Channels in source-detector order, Oxy- before Deoxy-Haemoglobin so each pair shares a dataplayer
+        wavelengths = nirs["probe"]["wavelengths"][()].ravel() if "wavelengths" in nirs["probe"] else []
+        channels = []
+        for name in data.keys():
+            if not name.startswith("measurementList"):
+                continue
+            ml = data[name]
+            column = int(name[len("measurementList"):])-1
+            source,detector = int(ml["sourceIndex"][()]),int(ml["detectorIndex"][()])
+            label = ml["dataTypeLabel"][()] if "dataTypeLabel" in ml else b""
+            label = label.decode() if isinstance(label,bytes) else str(label)
+            if label in self.KINDS:
+                kind,order = self.KINDS[label],list(self.KINDS).index(label)
+            else:
+                w = int(ml["wavelengthIndex"][()])-1
+                kind,order = ("{0:g}nm".format(wavelengths[w]) if 0 <= w < len(wavelengths) else label or "?"),len(self.KINDS)+w
+            channels.append(((source,detector,order),column,"S{0}-D{1} {2}".format(source,detector,kind)))
+        channels.sort()
+        self.columns = np.array([c[1] for c in channels],dtype=int)# Dataset column of each sensor
+        self.sensors = [c[2] for c in channels]
+
+    def __len__(self):
+        return self.measurements
+
+    def fetch(self,i0,i1,cols):
+        """Get rows i0 to i1 of the given columns, reading only that range of rows from disk"""
+        i0,i1 = max(0,i0),min(i1,self.measurements)
+        if i1 <= i0:
+            return i0,np.empty((0,len(cols)))
+        columns,order = np.unique(self.columns[cols],return_inverse=True)# h5py needs increasing columns
+        with self.lock:
+            rows = self.dataset[i0:i1,columns.tolist()]
+        return i0,np.asarray(rows,dtype=np.float64)[:,order.ravel()]
+
+    def summarise(self,i0,i1,cols):
+        """Get the first row, min and max of each block intersecting rows i0 to i1,
+            a channel's blocks are summarised in one bounded pass the first time it is asked for"""
+        missing = [c for c in dict.fromkeys(cols) if c not in self.summaries]
+        if missing:
+            mins,maxs = [],[]
+            for j0 in range(0,self.measurements,self.SECTION_ROWS):
+                _,rows = self.fetch(j0,j0+self.SECTION_ROWS,missing)
+                pad = -len(rows)%self.blockRows
+                blocks = np.concatenate([rows,np.full((pad,len(missing)),np.nan)]).reshape(-1,self.blockRows,len(missing))
+                mins.append(np.fmin.reduce(blocks,axis=1))
+                maxs.append(np.fmax.reduce(blocks,axis=1))
+            mins,maxs = np.concatenate(mins),np.concatenate(maxs)
+            for j,c in enumerate(missing):
+                self.summaries[c] = (mins[:,j],maxs[:,j])
+        k0,k1 = max(0,i0)//self.blockRows,(max(i0+1,i1)-1)//self.blockRows+1
+        return (np.arange(k0,k1)*self.blockRows,np.column_stack([self.summaries[c][0][k0:k1] for c in cols]),
+                np.column_stack([self.summaries[c][1][k0:k1] for c in cols]))
+
+
+class RingBuffer():
+    """Preallocated Sample Store of Fixed Capacity, the Oldest Samples are Overwritten"""
+
+    def __init__(self,capacity,channels):
+        """Allocates the whole buffer up front so memory never grows"""
+        self.capacity = capacity
+        self.buffer = np.full((capacity,channels),np.nan)
+        self.count = 0# Total samples ever appended, row indices are absolute
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def append(self,rows):
+        """Append rows of samples, wrapping around the end of the buffer"""
+        rows = np.asarray(rows,dtype=float).reshape(-1,self.buffer.shape[1])
+        with self.lock:
+            skipped = max(0,len(rows)-self.capacity)# Rows that would be overwritten immediately
+            rows = rows[skipped:]
+            start = (self.count+skipped) % self.capacity
+            first = min(len(rows),self.capacity-start)
+            self.buffer[start:start+first] = rows[:first]
+            self.buffer[:len(rows)-first] = rows[first:]
+            self.count += skipped+len(rows)
+
+    def fetch(self,i0,i1,cols):
+        """Get absolute rows i0 to i1 of the given columns that are still retained"""
+        with self.lock:
+            i0 = max(i0,self.count-self.capacity,0)
+            i1 = min(i1,self.count)
+            if i1 <= i0:
+                return i0,np.empty((0,len(cols)))
+            idx = np.arange(i0,i1) % self.capacity
+            return i0,self.buffer[idx[:,None],np.asarray(cols)[None,:]]
+
+
+class LineReader():
+    """Splits Streamed Comma Separated Text into Rows, the First Non-Numeric Line is the Header"""
+
+    def __init__(self):
+        self.partial = ""# Incomplete line carried over to the next feed
+        self.sensors = None# Sensor names, from the header
+        self.samplerate = None# From an optional '# samplerate: <Hz>' line
+
+    def feed(self,text):
+        """Parse newly received text, returns complete sample rows"""
+        lines = (self.partial+text).split("\n")
+        self.partial = lines.pop()
+        rows = []
+        for line in lines:
+            line = line.strip()
+            if line == "":
+                continue
+            if line.startswith("#"):# Metadata comment
+                key,_,value = line[1:].partition(":")
+                if key.strip().lower() == "samplerate":
+                    self.samplerate = float(value)
+                continue
+            cells = line.split(",")
+            try:
+                row = [float(c) if c.strip() else np.nan for c in cells]
+            except ValueError:# Header, repeats are ignored
+                if self.sensors is None:
+                    self.sensors = [c.strip() for c in cells]
+                continue
+            if self.sensors is not None:
+                rows.append((row+[np.nan]*len(self.sensors))[:len(self.sensors)])
+        return rows
+
+
+class TailSource():
+    """Follows a Growing .csv or .xml Export, Reading Only what has been Appended"""
+    CHUNK_BYTES = 2**20# Most read at once, so attaching to a large export does not load it whole
+
+    def __init__(self,path):
+        self.path = path
+        self.file = open(path,"rb")
+        self.xml = path.lower().endswith(".xml")
+        self.sensors = None
+        self.samplerate = None
+        if self.xml:
+            self.parser = ET.XMLPullParser(events=("start","end"))
+            self.stack = []# Tags of currently open elements
+            self.dataElement = None
+        else:
+            self.lines = LineReader()
+            self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")# Chunks may split characters
+
+    def read(self,size=CHUNK_BYTES):
+        """Get rows appended since the last read, at most size bytes of them"""
+        chunk = self.file.read(size)
+        if not chunk:
+            return []
+        return self.parse(chunk)
+
+    def parse(self,chunk):
+        """Parse the next chunk of the file, returns complete rows"""
+        if not self.xml:
+            rows = self.lines.feed(self.decoder.decode(chunk))
+            self.sensors,self.samplerate = self.lines.sensors,self.lines.samplerate
+            return rows
+        rows = []
+        self.parser.feed(chunk)
+        for event,elem in self.parser.read_events():
+            if event == "start":
+                self.stack.append(elem.tag)
+                if self.stack[1:] == ["data"]:
+                    self.dataElement = elem
+                continue
+            self.stack.pop()
+            parent = self.stack[-1] if self.stack else None
+            if parent == "columns":
+                self.sensors = (self.sensors or [])+[elem.text]
+            elif elem.tag == "samplerate" and parent == "device":
+                self.samplerate = float(elem.text)
+            elif parent == "data" and self.sensors is not None:
+                row = [float(cell.text or "nan") for cell in elem]
+                rows.append((row+[np.nan]*len(self.sensors))[:len(self.sensors)])
+                self.dataElement.clear()# Discard parsed rows to keep memory bounded
+        return rows
+
+    def close(self):
+        self.file.close()
+
+
+class SocketSource():
+    """Receives Comma Separated Sample Lines from tcp://host:port or udp://host:port"""
+
+    def __init__(self,protocol,host,port):
+        self.protocol,self.host,self.port = protocol,host,port
+        self.lines = LineReader()
+        self.sensors = None
+        self.samplerate = None
+        self.sock = None
+        if protocol == "udp":
+            self.sock = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+            self.sock.bind((host,port))
+            self.sock.settimeout(0.1)
+
+    def read(self):
+        """Get rows received since the last read, connecting to a TCP feeder if needed"""
+        if self.sock is None:# TCP, connect or retry
+            try:
+                self.sock = socket.create_connection((self.host,self.port),timeout=0.5)
+                self.sock.settimeout(0.1)
+            except OSError:
+                self.sock = None
+                time.sleep(0.5)
+                return []
+        try:
+            chunk = self.sock.recv(65536)
+        except socket.timeout:
+            return []
+        except OSError:
+            chunk = b""
+        if not chunk and self.protocol == "tcp":# Feeder disconnected, reconnect on next read
+            self.sock.close()
+            self.sock = None
+            return []
+        rows = self.lines.feed(chunk.decode(errors="replace"))
+        self.sensors,self.samplerate = self.lines.sensors,self.lines.samplerate
+        return rows
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+
+
+def parseLiveTarget(target):
+    """Split a live source into (protocol, host, port), or ("file", path, None)"""
+    for protocol in ["tcp","udp"]:
+        if target.lower().startswith(protocol+"://"):
+            host,_,port = target[len(protocol)+3:].rpartition(":")
+            return (protocol,host or "127.0.0.1",int(port))
+    return ("file",target,None)
+
+def openLiveSource(target):
+    """Open a live source from a file path, tcp://host:port or udp://host:port"""
+    protocol,host,port = parseLiveTarget(target)
+    if protocol == "file":
+        return TailSource(host)
+    return SocketSource(protocol,host,port)
+
+
+class LiveSession():
+    """Tails a Recording in Progress into a Ring Buffer, and Refreshes DataPlayers at a Fixed Rate"""
+    REFRESH_MS = 100# DataPlayer refresh period (ms)
+    WINDOW = 30# Seconds shown when the session starts
+
+    def __init__(self,app,source,samplerate,seconds):
+        self.app = app
+        self.source = source
+        self.samplerate = samplerate# Used if the source does not state one
+        self.seconds = seconds# Buffer length
+        self.buffer = None# Allocated once the source header is known
+        self.configured = False# Whether the app has been switched over to the buffer
+        self.shown = 0# Samples shown at last refresh
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.readThread,daemon=True).start()
+        self.app.root.after(self.REFRESH_MS,self.refresh)
+
+    def stop(self):
+        """Stop following the source, the buffered data stays on screen"""
+        self.running = False
+
+    def readThread(self):
+        """Append new samples to the ring buffer, never touches widgets"""
+        try:
+            while self.running:
+                rows = self.source.read()
+                if self.buffer is None and self.source.sensors:
+                    self.samplerate = self.source.samplerate or self.samplerate
+                    self.buffer = RingBuffer(max(1,int(self.seconds*self.samplerate)),len(self.source.sensors))
+                if rows and self.buffer is not None:
+                    self.buffer.append(rows)
+                elif not rows:
+                    time.sleep(0.02)
+        except Exception as e:
+            print("Error Reading Live Source:",e)
+        finally:
+            self.source.close()
+
+    def configure(self):
+        """Point the app at the ring buffer and show the first channel"""
+        app = self.app
+        app.populateQueue = []
+        app.tree,app.data = None,None
+        app.samplerate = self.samplerate
+        app.sensors = list(self.source.sensors)
+        app.sensorMask = [True]*len(app.sensors)
+        app.measurements = len(self.buffer)
+        app.values = self.buffer
+        app.timebase = Timebase(self.samplerate)
+        app.quality = None# Quality is only scanned for files
+        app.selection = None
+        app.tasks.cancel("quality")
+        app.deleteAllDataplayers()
+        app.channelSelector.loadData(None)
+        mask = [1]*min(2,len(app.sensors))+[0]*max(0,len(app.sensors)-2)
+        app.channelSelector.setMask(mask)
+        app.reconfigureChannels(app.dataPath,mask)
+        for dp in app.dataPlayers:
+            dp.setScaleX(len(self.buffer)-self.WINDOW*self.samplerate,len(self.buffer))
+        self.configured = True
+
+    def refresh(self):
+        """Follow the newest sample, only the visible window is prepared for drawing"""
+        if not self.running or self.app.values is not self.buffer and self.configured:
+            return# Stopped, or replaced by other data
+        if self.buffer is not None and not self.configured:
+            self.configure()
+        if self.configured and len(self.buffer) != self.shown:
+            self.shown = len(self.buffer)
+            self.app.measurements = self.shown
+            for dp in self.app.dataPlayers:
+                dp.measurements = self.shown
+                scalex,_ = dp.getScale()
+                span = min(scalex[1]-scalex[0],self.buffer.capacity)# Keep the user's zoom
+                dp.progress = self.shown/self.samplerate
+                dp.setScaleX(self.shown-span,self.shown)
+                dp.draw()
+        self.app.root.after(self.REFRESH_MS,self.refresh)
+
+
+def liveFeeder(target,samplerate=10,channels=8):
+    """Local Test Feeder, Streams Synthetic fNIRS Samples to a File, tcp://host:port or udp://host:port"""
+    sensors = []
+    for c in range(1,channels//2+1):
+        sensors += ["CH{0} O2Hb".format(c),"CH{0} HHb".format(c)]
+    header = "# samplerate: {0}\n{1}\n".format(samplerate,",".join(sensors))
+    phase = np.random.rand(channels)*2*np.pi
+    def lines(i0,i1):
+        """Synthetic Mayer wave, cardiac and noise components"""
+        t = np.arange(i0,i1)[:,None]/samplerate
+        oxy = np.sin(2*np.pi*0.1*t+phase)+0.2*np.sin(2*np.pi*1.0*t+phase)+0.05*np.random.randn(i1-i0,channels)
+        oxy[:,1::2] *= -0.4# Deoxy channels are smaller and anticorrelated
+        return "".join(",".join("{0:.4f}".format(v) for v in row)+"\n" for row in oxy)
+    protocol,host,port = parseLiveTarget(target)
+    print("Feeding {0} channels at {1}Hz to {2}, Ctrl+C to stop".format(channels,samplerate,target))
+    conn,out = None,None
+    if protocol == "file":
+        out = open(host,"w")
+        out.write(header)
+    elif protocol == "tcp":
+        server = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEADDR,1)
+        server.bind((host,port))
+        server.listen(1)
+    else:
+        conn = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+    t0,sent = time.time(),0
+    try:
+        while True:
+            if protocol == "tcp" and conn is None:
+                conn,_ = server.accept()
+                conn.sendall(header.encode())
+            due = int((time.time()-t0)*samplerate)
+            text = lines(sent,due)
+            if protocol == "udp" and sent//samplerate != due//samplerate:# Repeat header each second for late listeners
+                text = header+text
+            try:
+                if protocol == "file":
+                    out.write(text)
+                    out.flush()
+                elif protocol == "tcp":
+                    conn.sendall(text.encode())
+                else:
+                    conn.sendto(text.encode(),(host,port))
+            except OSError:# Viewer disconnected, wait for the next one
+                conn.close()
+                conn = None
+            sent = due
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+
+
 def qa_test():
     """Quality Assurance Logging Subroutine"""
+    # QA only dependency, imported here so it is not needed to run the tool
+    from radon.raw import analyze
+    from radon.complexity import cc_rank, cc_visit
     # Reads Code and Runs Code Metrics
     with open("BrainDataVisualiser.py","r") as file:
         code = file.read()
@@ -1121,7 +4267,193 @@ def qa_test():
         for i in cc_visit(code):
             file.write("\t\t"+cc_rank(i.complexity)+" "+str(i)+"\n")
 
-# For Testing
+def readProject(path):
+    """Get the data path, data offset and channel mask saved in a project's settings file,
+        a relative data path is taken from the settings file's folder"""
+    config = configparser.ConfigParser()
+    if not config.read(path) or "Settings" not in config:
+        raise ValueError("{0} has no [Settings]".format(path))
+    settings = config["Settings"]
+    dataPath = settings.get("datapath",fallback="")
+    if dataPath == "":
+        raise ValueError("{0} has no fNIRS data".format(path))
+    dataPath = os.path.join(os.path.dirname(os.path.abspath(path)),dataPath)
+    mask = [int(c) for c in settings.get("channelmask",fallback="") if c in "01"]
+    return dataPath,settings.getfloat("dataoffset",fallback=0),mask
+
+def resampleProject(path,rate):
+    """Load a project's recording and resample it onto the group grid, runs in a worker process.
+        The grid is in video time, sample k at k/rate seconds, so sessions are aligned by their data offsets.
+        Returns the sensor names, the first grid sample covered and the (samples x sensors) resampled data,
+        channels outside the project's channel mask are missing"""
+    dataPath,offset,mask = readProject(path)
+    parsed = parseFNIRS(dataPath)
+    values,sensors = parsed["values"],parsed["sensors"]
+    timebase = parsed.get("timebase") or Timebase(parsed["samplerate"],parsed["timestamps"])
+    n = len(values)
+    times = timebase.timesOf(0,n)-offset# Video time of each row
+    if n < 2 or times[-1] < 0:
+        return sensors,0,np.empty((0,len(sensors)))
+    k0,k1 = max(0,int(np.ceil(times[0]*rate))),int(np.floor(times[-1]*rate))+1
+    grid = np.arange(k0,k1)/rate
+    samples = np.full((len(grid),len(sensors)),np.nan)
+    for c in range(len(sensors)):
+        if mask and (c >= len(mask) or not mask[c]):
+            continue
+        x = fetchRows(values,0,n,[c])[1][:,0]
+        samples[:,c] = np.interp(grid,times,x)# Missing readings stay missing
+    if hasattr(values,"file"):
+        values.file.close()
+    return sensors,k0,samples
+
+class GrandAverage():
+    """Per-Channel Mean and SD across Sessions on a Common Grid, Accumulated One Session at a Time
+        with Welford's Update so no Session is Kept after it is Added. Channels are Matched by Name"""
+
+    def __init__(self,rate):
+        self.rate = rate
+        self.sensors = []
+        self.sessions = 0
+        self.count = np.zeros((0,0))# Sessions with a sample, per grid sample and channel
+        self.mean = np.zeros((0,0))
+        self.m2 = np.zeros((0,0))# Sum of squared differences from the mean
+
+    def grow(self,rows,channels):
+        """Extend the accumulators, at least doubling rows so sessions of increasing length stay linear"""
+        if rows <= len(self.count) and channels <= self.count.shape[1]:
+            return
+        if rows > len(self.count):
+            rows = max(rows,2*len(self.count))
+        rows,channels = max(rows,len(self.count)),max(channels,self.count.shape[1])
+        for name in ["count","mean","m2"]:
+            old = getattr(self,name)
+            new = np.zeros((rows,channels))
+            new[:old.shape[0],:old.shape[1]] = old
+            setattr(self,name,new)
+
+    def add(self,sensors,k0,samples):
+        """Add one session's resampled data, starting at grid sample k0"""
+        for name in sensors:
+            if name not in self.sensors:
+                self.sensors.append(name)
+        cols = [self.sensors.index(name) for name in sensors]
+        k1 = k0+len(samples)
+        self.grow(k1,len(self.sensors))
+        count,mean,m2 = self.count[k0:k1,cols],self.mean[k0:k1,cols],self.m2[k0:k1,cols]
+        ok = np.isfinite(samples)
+        x = np.where(ok,samples,0.0)
+        count += ok
+        delta = np.where(ok,x-mean,0.0)
+        mean += delta/np.maximum(count,1)
+        m2 += np.where(ok,delta*(x-mean),0.0)
+        self.count[k0:k1,cols],self.mean[k0:k1,cols],self.m2[k0:k1,cols] = count,mean,m2
+        self.sessions += 1
+
+    def result(self):
+        """Get the mean and SD (grid samples x channels), NaN where too few sessions have a sample"""
+        rows = int(np.max(np.nonzero(self.count.any(axis=1))[0],initial=-1))+1
+        count = self.count[:rows]
+        with np.errstate(invalid="ignore",divide="ignore"):
+            mean = np.where(count > 0,self.mean[:rows],np.nan)
+            sd = np.where(count > 1,np.sqrt(self.m2[:rows]/(count-1)),np.nan)
+        return mean,sd
+
+    def save(self,path,chunkRows=10000):
+        """Write the mean then SD of each channel as a .csv recording the viewer can open"""
+        mean,sd = self.result()
+        with open(path,"w") as file:
+            file.write("# samplerate: {0}\n# sessions: {1}\n".format(self.rate,self.sessions))
+            file.write(",".join(self.sensors+[name+" SD" for name in self.sensors])+"\n")
+            for i in range(0,len(mean),chunkRows):
+                np.savetxt(file,np.hstack([mean[i:i+chunkRows],sd[i:i+chunkRows]]),fmt="%.6g",delimiter=",")
+
+def grandAverage(projects,out,rate=10,workers=None):
+    """Grand average of many projects' recordings, loaded and resampled in parallel worker processes.
+        At most two sessions per worker are in flight, results are folded in as they finish"""
+    workers = workers or os.cpu_count() or 2
+    average = GrandAverage(rate)
+    t_start = time.time()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        queued = list(projects)
+        pending = {}
+        while queued or pending:
+            while queued and len(pending) < 2*workers:
+                path = queued.pop(0)
+                pending[pool.submit(resampleProject,path,rate)] = path
+            done,_ = concurrent.futures.wait(pending,return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    average.add(*future.result())
+                    print("Added",path)
+                except Exception as e:
+                    print("Skipping {0}: {1}".format(path,e))
+    average.save(out)
+    print("Grand Average of {0} Sessions Written to {1}[{2}]".format(average.sessions,out,int(time.time()-t_start)))
+    return average
+
+def benchmark_loaders(rows=100000,channels=40,samplerate=10):
+    """Loader Benchmarks, Times Each Registered Format on the Same Synthetic Recording"""
+    sensors = []
+    for c in range(1,channels//2+1):
+        sensors += ["CH{0} O2Hb".format(c),"CH{0} HHb".format(c)]
+    values = np.random.randn(rows,channels)
+    directory = tempfile.mkdtemp(prefix="bdv_bench")
+    paths = {}
+    # Vendor xml
+    paths[".xml"] = os.path.join(directory,"bench.xml")
+    with open(paths[".xml"],"w") as file:
+        file.write("<nirs><device><samplerate>{0}</samplerate></device><columns>".format(samplerate))
+        file.write("".join("<c>{0}</c>".format(name) for name in sensors)+"</columns><data>\n")
+        for row in values:
+            file.write("<r>"+"".join("<v>{0:.4f}</v>".format(v) for v in row)+"</r>\n")
+        file.write("</data></nirs>")
+    # csv
+    paths[".csv"] = os.path.join(directory,"bench.csv")
+    with open(paths[".csv"],"w") as file:
+        file.write("# samplerate: {0}\n{1}\n".format(samplerate,",".join(sensors)))
+        np.savetxt(file,values,fmt="%.4f",delimiter=",")
+    # SNIRF, if h5py is installed
+    try:
+        paths[".snirf"] = os.path.join(directory,"bench.snirf")
+        with h5py.File(paths[".snirf"],"w") as file:
+            data = file.create_group("nirs/data1")
+            data["dataTimeSeries"] = values
+            data["time"] = np.array([0,1/samplerate])
+            for k,name in enumerate(sensors):
+                ml = data.create_group("measurementList{0}".format(k+1))
+                ml["sourceIndex"],ml["detectorIndex"] = k//2+1,1
+                ml["wavelengthIndex"],ml["dataType"] = 1,99999
+                ml["dataTypeLabel"] = ["HbO","HbR"][k%2]
+            file.create_group("nirs/probe")
+    except ImportError:
+        print("h5py not installed, skipping SNIRF")
+        paths.pop(".snirf")
+    results = []
+    for extension,path in paths.items():
+        t_start = time.perf_counter()
+        parsed = parseFNIRS(path)
+        t_parse = time.perf_counter()
+        fetchRows(parsed["values"],0,rows,list(range(channels)))
+        t_all = time.perf_counter()
+        fetchRows(parsed["values"],rows//2,rows//2+1000,[0,1])# One dataplayer's view
+        t_window = time.perf_counter()
+        results.append("{0}\tparse {1:.3f}s\tread all {2:.3f}s\tread window {3:.4f}s\tfile {4:.1f}MB".format(
+            extension,t_parse-t_start,t_all-t_parse,t_window-t_all,os.path.getsize(path)/2**20))
+        print(results[-1])
+        if hasattr(parsed["values"],"file"):
+            parsed["values"].file.close()
+    shutil.rmtree(directory,ignore_errors=True)
+    with open("QA_LOGS.txt","a") as file:
+        file.write(datetime.date.today().strftime("%b-%d-%Y")+"\n\t")
+        file.write("Loader Benchmarks ({0} rows x {1} channels)\n".format(rows,channels))
+        for line in results:
+            file.write("\t\t"+line+"\n")
+
+# For Testing, run with --feed <target> to stream synthetic samples for live mode,
+# or --bench to append loader benchmarks to QA_LOGS.txt
+# Run with --grand-average <out.csv> <project.ini>... [--rate <Hz>] to average many projects,
+# the output opens as fNIRS data
 THERMAL = "C:\\Users\\hench\\OneDrive - The University of Nottingham\\Julian_Max_project\\P_09\\Thermal\\P_09_thermal.wmv"
 VISUAL = "C:\\Users\\hench\\OneDrive - The University of Nottingham\\Julian_Max_project\\P_09\\Visual\\converted\\M2U00010.mp4"
 #C:\Users\hench\OneDrive - The University of Nottingham\Julian_Max_project\P_09\Thermal\P_09_thermal.wmv
@@ -1135,11 +4467,30 @@ data_path_gyro = "C:\\Users\\hench\\OneDrive - The University of Nottingham\\Jul
 
 ##qa_test()
 
-app = Application()
-app.play()
-app.pause()
+# Worker processes import this file, only the main process runs the app
+if __name__ == "__main__":
+    multiprocessing.freeze_support()# Worker processes of a PyInstaller build start here
+    if "--feed" in sys.argv:
+        liveFeeder(sys.argv[sys.argv.index("--feed")+1])
+        sys.exit()
+    if "--bench" in sys.argv:
+        benchmark_loaders()
+        sys.exit()
+    if "--grand-average" in sys.argv:
+        args = sys.argv[sys.argv.index("--grand-average")+1:]
+        rate = 10
+        if "--rate" in args:
+            rate = float(args.pop(args.index("--rate")+1))
+            args.remove("--rate")
+        projects = [path for pattern in args[1:] for path in sorted(glob.glob(pattern)) or [pattern]]# Windows shells do not expand wildcards
+        grandAverage(projects,args[0],rate)
+        sys.exit()
+
+    app = Application()
+    app.play()
+    app.pause()
 
-app.mainloop()
-# Release video if used
-if app.videoPlayer.vid != None:
-    app.videoPlayer.vid.release()
+    app.mainloop()
+    # Release video if used
+    if app.videoPlayer.vid != None:
+        app.videoPlayer.vid.release()